@@ -0,0 +1,114 @@
+"""
+Integrated autocorrelation time of a time series (Required_Tasks 7).
+
+The binning plateau gives τ_int only by eye. Here the normalized
+autocorrelation function
+
+    ρ(t) = <(x_s - <x>)(x_{s+t} - <x>)> / <(x - <x>)²>
+
+is computed for all t at once with an FFT in O(n log n), and
+
+    τ_int(W) = 1/2 + Σ_{t=1}^{W} ρ(t)
+
+is summed up to an automatic window W: the smallest W with W >= c τ_int(W)
+(Sokal's rule, c ≈ 5). Its statistical error is τ_int sqrt(2 (2W + 1) / n)
+(Madras-Sokal). With this convention the error of the mean of x is
+
+    σ_mean = sqrt(2 τ_int Var(x) / n)
+
+which is the plateau value of the binning analysis. τ_int is in units of the
+measurement interval (n_meas MCS).
+
+1e7 samples take a few seconds; memory-mapped series (series_io.open_series)
+are read in chunks.
+"""
+
+import numpy as np
+
+CHUNK = 1 << 20
+
+# ==============================================================================
+# AUTOCORRELATION FUNCTION
+# ==============================================================================
+
+def _centered(series):
+    """Float64 copy of the series minus its mean, read in chunks."""
+    n = len(series)
+    x = np.empty(n, dtype=np.float64)
+    for start in range(0, n, CHUNK):
+        x[start:start + CHUNK] = series[start:start + CHUNK]
+    x -= x.mean()
+    return x
+
+def autocorrelation(series, max_lag=None):
+    """
+    Normalized autocorrelation function ρ(t), computed with an FFT.
+
+    Parameters:
+        series: (n,) time series (array or numpy.memmap)
+        max_lag: largest t returned (default: n - 1)
+
+    Returns:
+        rho: (max_lag + 1,) array with rho[0] = 1
+    """
+    n = len(series)
+    if max_lag is None:
+        max_lag = n - 1
+    x = _centered(series)
+
+    # Zero padding to >= 2n avoids the circular wrap-around of the FFT
+    n_fft = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(x, n=n_fft)
+    acf = np.fft.irfft(spectrum.real**2 + spectrum.imag**2, n=n_fft)[:max_lag + 1]
+
+    if acf[0] == 0:
+        rho = np.zeros(max_lag + 1)
+        rho[0] = 1.0
+        return rho
+    return acf / acf[0]
+
+# ==============================================================================
+# INTEGRATED AUTOCORRELATION TIME
+# ==============================================================================
+
+def integrated_time(series, c=5.0):
+    """
+    Integrated autocorrelation time with automatic windowing.
+
+    Parameters:
+        series: (n,) time series
+        c: window constant of the rule W >= c τ_int(W)
+
+    Returns:
+        tau_int: integrated autocorrelation time (in measurement intervals)
+        tau_error: statistical error of tau_int
+        window: summation window W
+    """
+    n = len(series)
+    rho = autocorrelation(series)
+    tau = 0.5 + np.cumsum(rho[1:])      # tau[W - 1] = τ_int(W)
+
+    windows = np.arange(1, n)
+    satisfied = np.flatnonzero(windows >= c * tau)
+    window = windows[satisfied[0]] if satisfied.size else n - 1
+    tau_int = max(0.5, tau[window - 1]) if n > 1 else 0.5
+    tau_error = tau_int * np.sqrt(2.0 * (2 * window + 1) / n)
+    return float(tau_int), float(tau_error), int(window)
+
+def error_of_mean(series, c=5.0):
+    """
+    Statistical error of the mean, corrected for autocorrelations.
+
+    Parameters:
+        series: (n,) time series
+        c: window constant passed to integrated_time
+
+    Returns:
+        mean: sample mean
+        error: sqrt(2 τ_int Var / n)
+        tau_int: integrated autocorrelation time
+    """
+    x = np.asarray(series, dtype=np.float64)
+    n = len(x)
+    tau_int, _, _ = integrated_time(x, c)
+    return float(x.mean()), float(np.sqrt(2.0 * tau_int * x.var(ddof=1) / n)), tau_int
@@ -0,0 +1,374 @@
+"""
+Benchmark suite for the update engines, measurements and binning (Required_Tasks 2).
+
+Every case is timed over a matrix of lattice sizes L, temperatures T and
+geometries:
+- update engines: attempted flips per second (flipped cluster spins for the
+  cluster engines, 64 replicas per site for the multi-spin engine, R
+  replicas per site for the batched replica engine and for parallel
+  tempering); the domain-decomposed engine and parallel tempering start
+  their worker processes in every call
+- measurement functions: sites per second
+- binning implementations: samples per second
+
+Each case gets one untimed warm-up call (JIT compilation, caches), then
+`repeats` timed repeats of at least `min_time` seconds each. The median rate
+and its spread (min, max, interquartile range) are written to a JSON file.
+
+With --baseline, the results are compared with a stored JSON file and the
+script exits with status 1 if any case got slower by more than --threshold.
+
+Examples:
+    python benchmark.py --output bench.json
+    python benchmark.py --L 20 100 --T 2.27 --baseline bench.json --threshold 0.15
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from binning import BinningAccumulator
+from cluster import sweep_swendsen_wang, sweep_wolff
+from domain import run_domain
+from couplings import (coupling_sublattices, precompute_coupling_acceptance,
+                       random_bond_couplings, sweep_couplings)
+from geometry import create_nbr
+from ising import (binning_analysis, checkerboard_sublattices, measure_observables,
+                   precompute_acceptance, sweep_checkerboard, sweep_random, sweep_replicas)
+import kernels
+from multispin import measure_multispin, random_configuration, sweep_multispin
+from random_streams import precompute_thresholds
+from tempering import run_tempering
+
+# Engines in pure Python loops are skipped above these sizes
+MAX_N = {"random": 10**4, "wolff": 10**5, "replicas": 10**5}
+N_REPLICAS = 64   # replicas of the batched engine
+MAX_SAMPLES = 10**6   # length of the binning series (100 N, at most this)
+# Engines that only run on the square lattice with even L
+SQUARE_ONLY = ("domain",)
+DOMAIN_WORKERS = 2   # processes of the domain-decomposed engine
+DOMAIN_MCS = 10      # MCS per call of run_domain (includes starting the processes)
+TEMPERING_REPLICAS = 4   # temperatures of parallel tempering, T * 0.9 .. T * 1.1
+TEMPERING_WORKERS = 2    # processes of parallel tempering
+TEMPERING_MCS = 10       # MCS per call of run_tempering (one round of swaps)
+
+# ==============================================================================
+# BENCHMARK CASES
+# ==============================================================================
+"""
+A case is set up once by a function (nbr, T, rng) -> run, where run() does
+one unit of work and returns how many flips/sites/samples it processed.
+"""
+
+def _random_spins(N, rng):
+    return rng.choice(np.array([-1, 1], dtype=np.int8), size=N)
+
+def _engine_checkerboard(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    acceptance = precompute_acceptance(1.0 / T, nbr.shape[1])
+    sublattices = checkerboard_sublattices(nbr)
+    def run():
+        sweep_checkerboard(spins, nbr, acceptance, sublattices, rng)
+        return spins.size
+    return run
+
+def _engine_numba(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    acceptance = precompute_acceptance(1.0 / T, nbr.shape[1])
+    sublattices = checkerboard_sublattices(nbr)
+    if kernels.BACKEND != "numpy":
+        sublattices = np.concatenate(sublattices)
+    def run():
+        kernels.sweep_checkerboard(spins, nbr, acceptance, sublattices, rng)
+        return spins.size
+    return run
+
+def _engine_parallel(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    thresholds = precompute_thresholds(1.0 / T, nbr.shape[1])
+    sublattices = kernels.parallel_sublattices(checkerboard_sublattices(nbr))
+    def run():
+        kernels.sweep_parallel(spins, nbr, thresholds, sublattices, rng)
+        return spins.size
+    return run
+
+def _engine_couplings(nbr, T, rng):
+    # ±J couplings on the same bonds, through the CSR update
+    spins = _random_spins(nbr.shape[0], rng)
+    bonds = random_bond_couplings(nbr, rng)
+    acceptance = precompute_coupling_acceptance(1.0 / T, bonds)
+    sublattices = coupling_sublattices(bonds)
+    def run():
+        sweep_couplings(spins, bonds, acceptance, sublattices, rng)
+        return spins.size
+    return run
+
+def _engine_domain(nbr, T, rng):
+    L = int(np.sqrt(nbr.shape[0]))
+    state = [_random_spins(nbr.shape[0], rng)]
+    def run():
+        state[0] = run_domain(L, T, DOMAIN_MCS, DOMAIN_MCS, seed=int(rng.integers(2**63)),
+                              n_workers=DOMAIN_WORKERS, spins=state[0])[0]
+        return DOMAIN_MCS * state[0].size
+    return run
+
+def _engine_tempering(nbr, T, rng):
+    T_values = T * np.linspace(0.9, 1.1, TEMPERING_REPLICAS)
+    def run():
+        run_tempering(T_values, TEMPERING_MCS, TEMPERING_MCS, nbr=nbr,
+                      swap_interval=TEMPERING_MCS, seed=int(rng.integers(2**63)),
+                      n_workers=TEMPERING_WORKERS)
+        return TEMPERING_REPLICAS * TEMPERING_MCS * nbr.shape[0]
+    return run
+
+def _engine_random(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    acceptance = precompute_acceptance(1.0 / T, nbr.shape[1])
+    def run():
+        sweep_random(spins, nbr, acceptance, rng)
+        return spins.size
+    return run
+
+def _engine_wolff(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    return lambda: sweep_wolff(spins, nbr, 1.0 / T, rng)[3]
+
+def _engine_swendsen_wang(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    return lambda: sweep_swendsen_wang(spins, nbr, 1.0 / T, rng)[3]
+
+def _engine_replicas(nbr, T, rng):
+    spins = np.stack([_random_spins(nbr.shape[0], rng) for _ in range(N_REPLICAS)])
+    rngs = [np.random.default_rng(seed) for seed in rng.integers(2**63, size=N_REPLICAS)]
+    acceptance = precompute_acceptance(1.0 / T, nbr.shape[1])
+    sublattices = checkerboard_sublattices(nbr)
+    def run():
+        sweep_replicas(spins, nbr, acceptance, sublattices, rngs)
+        return spins.size
+    return run
+
+def _engine_multispin(nbr, T, rng):
+    words = random_configuration(nbr.shape[0], rng)
+    sublattices = checkerboard_sublattices(nbr)
+    def run():
+        sweep_multispin(words, nbr, 1.0 / T, sublattices, rng)
+        return 64 * words.size
+    return run
+
+def _measure_observables(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    def run():
+        measure_observables(spins, nbr)
+        return spins.size
+    return run
+
+def _measure_numba(nbr, T, rng):
+    spins = _random_spins(nbr.shape[0], rng)
+    def run():
+        kernels.measure_observables(spins, nbr)
+        return spins.size
+    return run
+
+def _measure_multispin(nbr, T, rng):
+    words = random_configuration(nbr.shape[0], rng)
+    def run():
+        measure_multispin(words, nbr)
+        return 64 * words.size
+    return run
+
+def _binning_analysis(nbr, T, rng):
+    series = rng.normal(size=min(100 * nbr.shape[0], MAX_SAMPLES))
+    def run():
+        binning_analysis(series)
+        return series.size
+    return run
+
+def _binning_accumulator(nbr, T, rng):
+    series = rng.normal(size=min(100 * nbr.shape[0], MAX_SAMPLES))
+    def run():
+        BinningAccumulator().extend(series)
+        return series.size
+    return run
+
+ENGINE_CASES = {
+    "checkerboard": _engine_checkerboard,
+    "numba": _engine_numba,
+    "parallel": _engine_parallel,
+    "couplings": _engine_couplings,
+    "domain": _engine_domain,
+    "tempering": _engine_tempering,
+    "random": _engine_random,
+    "wolff": _engine_wolff,
+    "swendsen-wang": _engine_swendsen_wang,
+    "multispin": _engine_multispin,
+    "replicas": _engine_replicas,
+}
+MEASUREMENT_CASES = {
+    "measure_observables": _measure_observables,
+    "measure_numba": _measure_numba,
+    "measure_multispin": _measure_multispin,
+}
+BINNING_CASES = {
+    "binning_analysis": _binning_analysis,
+    "BinningAccumulator": _binning_accumulator,
+}
+
+# ==============================================================================
+# TIMING
+# ==============================================================================
+
+def time_case(setup, nbr, T, seed, repeats=5, min_time=0.2):
+    """
+    Time one case: one warm-up call, then repeats of at least min_time seconds.
+
+    Parameters:
+        setup: case setup function (nbr, T, rng) -> run
+        nbr: neighbor array
+        T: temperature
+        seed: random number generator seed
+        repeats: number of timed repeats
+        min_time: minimum duration of one repeat in seconds
+
+    Returns:
+        stats: dict with median, min, max, q1, q3 of the rate (units per second)
+            and the list of all rates
+    """
+    rng = np.random.default_rng(seed)
+    run = setup(nbr, T, rng)
+    run()   # warm-up (JIT compilation, first-touch of memory)
+
+    rates = []
+    for _ in range(repeats):
+        units = 0
+        start_time = time.perf_counter()
+        while True:
+            units += run()
+            elapsed = time.perf_counter() - start_time
+            if elapsed >= min_time:
+                break
+        rates.append(units / elapsed)
+
+    q1, median, q3 = np.percentile(rates, [25, 50, 75])
+    return dict(median=median, min=min(rates), max=max(rates), q1=q1, q3=q3, rates=rates)
+
+def case_key(kind, name, geometry, L, T):
+    """Unique name of a case, used to match results with the baseline."""
+    return f"{kind}:{name}:{geometry}:L={L}:T={T:g}"
+
+def run_suite(L_values, T_values, geometries, engines=None, repeats=5, min_time=0.2,
+              seed=42, verbose=True):
+    """
+    Run every case over the (geometry, L, T) matrix.
+
+    Measurement and binning cases do not depend on T; they are run once per
+    (geometry, L).
+
+    Parameters:
+        L_values: lattice sizes
+        T_values: temperatures
+        geometries: names of geometries (see geometry.py)
+        engines: names of the engines to run (default: all ENGINE_CASES)
+        repeats: number of timed repeats of each case
+        min_time: minimum duration of one repeat in seconds
+        seed: random number generator seed
+        verbose: print one line per case
+
+    Returns:
+        results: dict of case key -> stats from time_case
+    """
+    engines = list(ENGINE_CASES) if engines is None else engines
+    results = {}
+
+    def record(kind, name, setup, nbr, geometry, L, T, unit):
+        key = case_key(kind, name, geometry, L, T)
+        stats = time_case(setup, nbr, T, seed, repeats, min_time)
+        stats.update(kind=kind, name=name, geometry=geometry, L=L, T=T, N=nbr.shape[0], unit=unit)
+        results[key] = stats
+        if verbose:
+            spread = (stats["q3"] - stats["q1"]) / stats["median"]
+            print(f"{key:<55} {stats['median']:>12.3e} {unit:<10} ±{100 * spread:5.1f}% (IQR)")
+
+    for geometry in geometries:
+        for L in L_values:
+            nbr = create_nbr(L, geometry)
+            N = nbr.shape[0]
+            for T in T_values:
+                for name in engines:
+                    if N > MAX_N.get(name, np.inf):
+                        continue
+                    if name in SQUARE_ONLY and (geometry != "square" or L % 2):
+                        continue
+                    record("engine", name, ENGINE_CASES[name], nbr, geometry, L, T, "flips/s")
+            for name, setup in MEASUREMENT_CASES.items():
+                record("measurement", name, setup, nbr, geometry, L, 0.0, "sites/s")
+            for name, setup in BINNING_CASES.items():
+                record("binning", name, setup, nbr, geometry, L, 0.0, "samples/s")
+    return results
+
+# ==============================================================================
+# BASELINE COMPARISON
+# ==============================================================================
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Find cases whose median rate dropped by more than threshold.
+
+    Parameters:
+        results: dict of case key -> stats
+        baseline: dict of case key -> stats from an earlier run
+        threshold: allowed relative slowdown (e.g. 0.2 = 20%)
+
+    Returns:
+        regressions: list of (key, baseline median, current median)
+    """
+    regressions = []
+    for key, stats in results.items():
+        if key in baseline:
+            reference = baseline[key]["median"]
+            if stats["median"] < (1.0 - threshold) * reference:
+                regressions.append((key, reference, stats["median"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Ising Monte Carlo code.")
+    parser.add_argument("--L", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--T", type=float, nargs="+", default=[2.0, 2.27, 2.6])
+    parser.add_argument("--geometry", nargs="+", default=["square"])
+    parser.add_argument("--engines", nargs="+", default=None, help="engines to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", default=None, help="JSON file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.L, args.T, args.geometry, args.engines, args.repeats,
+                        args.min_time, args.seed)
+    report = dict(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  machine=dict(platform=platform.platform(), python=platform.python_version(),
+                               numpy=np.__version__, processor=platform.processor()),
+                  settings=vars(args), results=results)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved as: {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for key, reference, current in regressions:
+            print(f"REGRESSION {key}: {current:.3e} < {reference:.3e} "
+                  f"({100 * (1 - current / reference):.1f}% slower)")
+        if regressions:
+            return 1
+        print(f"No regression beyond {100 * args.threshold:.0f}% against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Checkpoint and restart of long Monte Carlo runs.
+
+A checkpoint holds everything needed to continue a run exactly where it
+stopped, in one binary .npz file:
+- the spins, bit-packed (1 bit per site)
+- the full state of the numpy random number generator
+- the running E, M, the MCS counter and the flip counter
+- the time series measured so far and the binning accumulators
+- a hash of the run parameters, so a checkpoint is never resumed with
+  different parameters
+
+The file is written to a temporary name and then renamed, so a crash while
+writing never destroys the previous checkpoint. Resuming from a checkpoint
+gives bit-for-bit the same results as an uninterrupted run.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from random_streams import RandomBlocks, generator_of
+
+# ==============================================================================
+# PARAMETER HASH
+# ==============================================================================
+
+def _seed_key(seed):
+    """JSON-serializable description of a seed or SeedSequence."""
+    if isinstance(seed, np.random.SeedSequence):
+        return [str(seed.entropy), list(seed.spawn_key)]
+    return None if seed is None else str(seed)
+
+def parameter_hash(**params):
+    """
+    Hash of the run parameters.
+
+    Parameters:
+        params: run parameters (numbers, strings, seeds, arrays)
+
+    Returns:
+        hash: hexadecimal sha256 digest
+    """
+    digest = hashlib.sha256()
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, np.ndarray):
+            digest.update(f"{name}:{value.shape}:{value.dtype}".encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        elif name == "seed":
+            digest.update(f"{name}:{json.dumps(_seed_key(value))}".encode())
+        else:
+            digest.update(f"{name}:{value!r}".encode())
+    return digest.hexdigest()
+
+# ==============================================================================
+# SPIN PACKING
+# ==============================================================================
+
+def pack_spins(spins):
+    """
+    Pack ±1 spins into bits (1 = up).
+
+    Parameters:
+        spins: (N,) array of ±1 spins
+
+    Returns:
+        bits: (ceil(N / 8),) uint8 array
+    """
+    return np.packbits(spins > 0)
+
+def unpack_spins(bits, N):
+    """
+    Unpack bits from pack_spins back into ±1 spins.
+
+    Parameters:
+        bits: uint8 array from pack_spins
+        N: number of spins
+
+    Returns:
+        spins: (N,) int8 array of ±1 spins
+    """
+    return np.unpackbits(bits, count=N).astype(np.int8) * 2 - 1
+
+# ==============================================================================
+# SAVE AND LOAD
+# ==============================================================================
+
+def save_checkpoint(filename, params_hash, spins, rng, mcs_done, E, M, n_flipped=0,
+                    energies=None, magnetizations=None, accumulators=None):
+    """
+    Write the full simulation state to filename.
+
+    Parameters:
+        filename: checkpoint file (.npz)
+        params_hash: hash of the run parameters from parameter_hash
+        spins: (N,) array of ±1 spins
+        rng: numpy.random.Generator of the run, or random_streams.RandomBlocks
+            (then its buffered values are saved as well)
+        mcs_done: number of MCS completed
+        E, M: running energy and magnetization (a float E, as with
+            couplings.Couplings, is saved exactly as float64)
+        n_flipped: running flip counter
+        energies, magnetizations: time series arrays, if they are stored
+        accumulators: dict of name -> BinningAccumulator or MomentAccumulator
+    """
+    arrays = dict(params_hash=np.array(params_hash),
+                  N=np.array(spins.shape[0]),
+                  spins=pack_spins(spins),
+                  rng_state=np.array(json.dumps(generator_of(rng).bit_generator.state,
+                                                default=np.ndarray.tolist)),
+                  counters=np.array([mcs_done, 0, M, n_flipped], dtype=np.int64))
+    if isinstance(E, (float, np.floating)):
+        arrays["energy"] = np.array(E, dtype=np.float64)
+    else:
+        arrays["counters"][1] = E
+    if energies is not None:
+        arrays["energies"] = energies
+        arrays["magnetizations"] = magnetizations
+    if isinstance(rng, RandomBlocks):
+        for name, buffer in rng.get_state().items():
+            arrays[f"blocks/{name}"] = buffer
+    for name, accumulator in (accumulators or {}).items():
+        for key, value in accumulator.get_state().items():
+            arrays[f"binning/{name}/{key}"] = value
+
+    # Write to a temporary file, then atomically replace the old checkpoint
+    temporary = f"{filename}.tmp"
+    with open(temporary, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temporary, filename)
+
+def load_checkpoint(filename, params_hash=None):
+    """
+    Read a checkpoint written by save_checkpoint.
+
+    Parameters:
+        filename: checkpoint file (.npz)
+        params_hash: if given, the checkpoint must have been written by a run
+            with the same parameters
+
+    Returns:
+        state: dict with spins, rng_state, mcs_done, E (int, or float if it
+            was saved as a float), M, n_flipped,
+            energies, magnetizations (or None), binning (dict of name ->
+            accumulator state for set_state of the accumulator) and blocks
+            (state for RandomBlocks.set_state, or None)
+    """
+    with np.load(filename) as data:
+        saved_hash = str(data["params_hash"])
+        if params_hash is not None and saved_hash != params_hash:
+            raise ValueError(f"Checkpoint {filename} was written with different run parameters")
+
+        mcs_done, E, M, n_flipped = (int(x) for x in data["counters"])
+        if "energy" in data:
+            E = float(data["energy"])
+        state = dict(params_hash=saved_hash,
+                     spins=unpack_spins(data["spins"], int(data["N"])),
+                     rng_state=json.loads(str(data["rng_state"])),
+                     mcs_done=mcs_done, E=E, M=M, n_flipped=n_flipped,
+                     energies=data["energies"] if "energies" in data else None,
+                     magnetizations=data["magnetizations"] if "magnetizations" in data else None,
+                     binning={}, blocks=None)
+        for key in data.files:
+            if key.startswith("binning/"):
+                _, name, field = key.split("/")
+                state["binning"].setdefault(name, {})[field] = data[key]
+            elif key.startswith("blocks/"):
+                if state["blocks"] is None:
+                    state["blocks"] = {}
+                state["blocks"][key.split("/")[1]] = data[key]
+    return state
@@ -0,0 +1,192 @@
+"""
+Cluster update engines: Wolff single-cluster and Swendsen-Wang.
+
+Near T_c single-spin Metropolis needs thousands of MCS between independent
+configurations. Cluster algorithms flip whole clusters of aligned spins,
+built by adding aligned neighbors with probability p = 1 - exp(-2β), and
+decorrelate in a few steps.
+
+Like the Metropolis engines, both only use the neighbor array nbr.
+
+Running this file benchmarks the engines at one (L, T) and reports both the
+spin-flip rate and the number of effectively independent samples per second:
+    python cluster.py --L 100 --T 2.27
+"""
+
+import argparse
+import time
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from autocorr import integrated_time
+from ising import measure_observables, run_simulation
+
+# ==============================================================================
+# WOLFF SINGLE-CLUSTER UPDATE
+# ==============================================================================
+
+def wolff_cluster(spins, nbr, p_add, rng):
+    """
+    Grow and flip one Wolff cluster from a random seed site.
+
+    The cluster grows one whole frontier at a time: every bond from a
+    frontier site to an aligned site outside the cluster is tried once.
+
+    Parameters:
+        spins: (N,) array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        p_add: bond probability 1 - exp(-2β)
+        rng: numpy.random.Generator
+
+    Returns:
+        size: number of flipped spins
+        delta_E: energy change
+        delta_M: magnetization change
+    """
+    N = spins.shape[0]
+    seed = rng.integers(N)
+    s0 = spins[seed]
+    in_cluster = np.zeros(N, dtype=bool)
+    in_cluster[seed] = True
+    frontier = np.array([seed])
+
+    while frontier.size > 0:
+        candidates = nbr[frontier].ravel()
+        add = ((spins[candidates] == s0) & ~in_cluster[candidates]
+               & (rng.random(candidates.size) < p_add))
+        frontier = np.unique(candidates[add])
+        in_cluster[frontier] = True
+
+    cluster = np.flatnonzero(in_cluster)
+    # Only bonds across the cluster boundary change: ΔE = 2 S_0 Σ_boundary S_j
+    neighbors = nbr[cluster]
+    outside = ~in_cluster[neighbors]
+    delta_E = 2 * int(s0) * int(spins[neighbors[outside]].sum(dtype=np.int64))
+    spins[cluster] = -s0
+    return cluster.size, delta_E, -2 * int(s0) * cluster.size
+
+def sweep_wolff(spins, nbr, beta, rng):
+    """
+    Flip Wolff clusters until at least N spins have been flipped (one MCS).
+
+    Parameters:
+        spins: (N,) array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        beta: 1/T (inverse temperature)
+        rng: numpy.random.Generator
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change
+        delta_M: total magnetization change
+        n_flipped: number of flipped spins
+    """
+    N = spins.shape[0]
+    p_add = 1.0 - np.exp(-2.0 * beta)
+    total_delta_E = 0
+    total_delta_M = 0
+    n_flipped = 0
+    while n_flipped < N:
+        size, delta_E, delta_M = wolff_cluster(spins, nbr, p_add, rng)
+        total_delta_E += delta_E
+        total_delta_M += delta_M
+        n_flipped += size
+    return spins, total_delta_E, total_delta_M, n_flipped
+
+# ==============================================================================
+# SWENDSEN-WANG UPDATE
+# ==============================================================================
+
+def sweep_swendsen_wang(spins, nbr, beta, rng):
+    """
+    One Swendsen-Wang step: decompose the whole lattice into clusters and
+    flip each cluster with probability 1/2.
+
+    Each bond (i, j) of nbr with i < j is activated if S_i = S_j, with
+    probability 1 - exp(-2β); clusters are the connected components of
+    the active bonds.
+
+    Parameters:
+        spins: (N,) array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        beta: 1/T (inverse temperature)
+        rng: numpy.random.Generator
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change
+        delta_M: total magnetization change
+        n_flipped: number of flipped spins
+    """
+    N, z = nbr.shape
+    p_add = 1.0 - np.exp(-2.0 * beta)
+    E_old, M_old = measure_observables(spins, nbr)
+
+    i = np.repeat(np.arange(N), z)
+    j = nbr.ravel()
+    active = (i < j) & (spins[i] == spins[j]) & (rng.random(i.size) < p_add)
+    graph = coo_matrix((np.ones(np.count_nonzero(active), dtype=np.int8), (i[active], j[active])),
+                       shape=(N, N))
+    n_clusters, labels = connected_components(graph, directed=False)
+
+    flip = (rng.random(n_clusters) < 0.5)[labels]
+    spins[flip] *= -1
+    E_new, M_new = measure_observables(spins, nbr)
+    return spins, E_new - E_old, M_new - M_old, int(np.count_nonzero(flip))
+
+# ==============================================================================
+# BENCHMARK: FLIP RATE AND EFFECTIVE SAMPLE RATE
+# ==============================================================================
+
+def benchmark(L, T, n_MCS, n_meas, seed=None, engines=("checkerboard", "wolff", "swendsen-wang")):
+    """
+    Time each engine and report flip rate and effective sample rate.
+
+    "Spins flipped per second" is attempted flips for the Metropolis engines
+    (Required_Tasks 2) and flipped cluster spins for the cluster engines.
+    "Effective samples per second" is n_measurements / (2 τ_int) per second,
+    using the larger τ_int of E and |M| (see autocorr.py).
+
+    Parameters:
+        L: linear lattice size
+        T: temperature
+        n_MCS: number of MCS per engine
+        n_meas: number of MCS between two measurements
+        seed: random number generator seed
+        engines: engine names accepted by ising.run_simulation
+
+    Returns:
+        rows: list of dicts, one per engine
+    """
+    rows = []
+    for engine in engines:
+        stats = {}
+        start_time = time.time()
+        _, energies, magnetizations = run_simulation(L, T, n_MCS, n_meas, seed=seed,
+                                                     engine=engine, stats=stats)
+        elapsed = time.time() - start_time
+        tau = max(integrated_time(energies)[0], integrated_time(np.abs(magnetizations))[0])
+        rows.append(dict(engine=engine, elapsed=elapsed, tau_int=tau * n_meas,
+                         flips_per_second=stats["n_flipped"] / elapsed,
+                         samples_per_second=len(energies) / (2.0 * tau) / elapsed))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Metropolis and cluster engines.")
+    parser.add_argument("--L", type=int, default=100)
+    parser.add_argument("--T", type=float, default=2.27)
+    parser.add_argument("--n-mcs", type=int, default=20000)
+    parser.add_argument("--n-meas", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rows = benchmark(args.L, args.T, args.n_mcs, args.n_meas, seed=args.seed)
+    print(f"{'engine':<16} {'time (s)':<10} {'tau_int (MCS)':<15} {'flips/s':<12} {'samples/s':<12}")
+    for row in rows:
+        print(f"{row['engine']:<16} {row['elapsed']:<10.2f} {row['tau_int']:<15.2f} "
+              f"{row['flips_per_second']:<12.3e} {row['samples_per_second']:<12.3e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Bit-packed storage of spin configurations (snapshots).
+
+The text format of the practice files (test_configuration.dat, mys1.dat)
+has one "index spin" line per site, ~17 bytes per spin. Here a snapshot
+takes 1 bit per site (L = 1000: 125 kB instead of 17 MB), and many
+snapshots of a run go into one file:
+
+    magic "ISINGCFG" | header length (uint32) | JSON header, padded to 64 bytes
+    record 0: MCS (int64) | ceil(N / 8) bytes of packed spins (1 = up)
+    record 1: ...
+
+The header holds N, L, geometry, T and seed of the run; each record holds
+the MCS at which it was taken. Records have a fixed size, so the records
+part is opened as a numpy.memmap of a structured dtype and any snapshot is
+read without touching the others. New snapshots are appended at the end;
+a record cut short by a crash is ignored.
+
+The text format is read and written without a Python loop over sites, so
+the practice files and L = 1000 snapshots convert in well under a second
+(about 0.2 s to write and 0.4 s to read at N = 1e6).
+"""
+
+import json
+import os
+
+import numpy as np
+
+from series_io import parse_text_series
+
+MAGIC = b"ISINGCFG"
+HEADER_ALIGN = 64
+
+# ==============================================================================
+# HEADER AND RECORD LAYOUT
+# ==============================================================================
+
+def _seed_description(seed):
+    """JSON-serializable description of a seed or SeedSequence."""
+    if isinstance(seed, np.random.SeedSequence):
+        return {"entropy": str(seed.entropy), "spawn_key": list(seed.spawn_key)}
+    return None if seed is None else int(seed)
+
+def record_dtype(N):
+    """
+    Structured dtype of one snapshot record.
+
+    Parameters:
+        N: number of sites
+
+    Returns:
+        dtype: numpy dtype with fields "mcs" (int64) and "bits" (uint8 array)
+    """
+    return np.dtype([("mcs", "<i8"), ("bits", "u1", ((N + 7) // 8,))])
+
+def read_header(filename):
+    """
+    Read the header of a configuration file.
+
+    Parameters:
+        filename: configuration file
+
+    Returns:
+        header: dict with N, L, geometry, T, seed and the byte offset of the
+            first record ("offset")
+    """
+    with open(filename, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not a configuration file")
+        length = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+        header = json.loads(f.read(length).rstrip(b" "))
+    header["offset"] = len(MAGIC) + 4 + length
+    return header
+
+# ==============================================================================
+# WRITING
+# ==============================================================================
+
+def create_configurations(filename, N, L=None, geometry="square", T=None, seed=None):
+    """
+    Create an empty configuration file (an existing file is overwritten).
+
+    Parameters:
+        filename: configuration file
+        N: number of sites
+        L: linear size of the lattice
+        geometry: name of the lattice (see geometry.py)
+        T: temperature of the run
+        seed: seed or numpy.random.SeedSequence of the run
+    """
+    header = json.dumps(dict(N=int(N), L=None if L is None else int(L), geometry=geometry,
+                             T=None if T is None else float(T),
+                             seed=_seed_description(seed))).encode()
+    # Pad so that the records start on an aligned offset
+    length = -(len(MAGIC) + 4 + len(header)) % HEADER_ALIGN + len(header)
+    with open(filename, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.array(length, dtype="<u4").tobytes())
+        f.write(header.ljust(length, b" "))
+
+def append_configurations(filename, spins, mcs):
+    """
+    Append one or several snapshots at the end of a configuration file.
+
+    Parameters:
+        filename: configuration file from create_configurations
+        spins: (N,) array of ±1 spins, or (n, N) for n snapshots
+        mcs: MCS of the snapshot, or (n,) array
+    """
+    header = read_header(filename)
+    spins = np.atleast_2d(spins)
+    if spins.shape[1] != header["N"]:
+        raise ValueError(f"Expected {header['N']} spins, got {spins.shape[1]}")
+
+    records = np.empty(len(spins), dtype=record_dtype(header["N"]))
+    records["mcs"] = mcs
+    records["bits"] = np.packbits(spins > 0, axis=1)
+
+    with open(filename, "r+b") as f:
+        # Start after the last complete record (drops a record cut by a crash)
+        end = header["offset"] + count_configurations(filename) * records.dtype.itemsize
+        f.truncate(end)
+        f.seek(end)
+        f.write(records.tobytes())
+
+def truncate_configurations(filename, max_mcs):
+    """
+    Drop the snapshots taken after max_mcs, e.g. when a run resumes from
+    a checkpoint written at max_mcs.
+
+    Parameters:
+        filename: configuration file
+        max_mcs: largest MCS to keep
+    """
+    _, records = open_configurations(filename)
+    n_keep = int(np.count_nonzero(records["mcs"] <= max_mcs))
+    offset, itemsize = read_header(filename)["offset"], records.dtype.itemsize
+    del records
+    with open(filename, "r+b") as f:
+        f.truncate(offset + n_keep * itemsize)
+
+# ==============================================================================
+# READING
+# ==============================================================================
+
+def count_configurations(filename):
+    """Number of complete snapshots in a configuration file."""
+    header = read_header(filename)
+    itemsize = record_dtype(header["N"]).itemsize
+    return (os.path.getsize(filename) - header["offset"]) // itemsize
+
+def open_configurations(filename):
+    """
+    Open the snapshots of a configuration file without reading them.
+
+    Parameters:
+        filename: configuration file
+
+    Returns:
+        header: dict from read_header
+        records: (n,) read-only numpy.memmap with fields "mcs" and "bits"
+            (empty array if there is no snapshot yet)
+    """
+    header = read_header(filename)
+    dtype = record_dtype(header["N"])
+    n = count_configurations(filename)
+    if n == 0:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(filename, dtype=dtype, mode="r", offset=header["offset"], shape=(n,))
+
+def load_configuration(filename, index):
+    """
+    Read one snapshot.
+
+    Parameters:
+        filename: configuration file
+        index: number of the snapshot (negative counts from the end)
+
+    Returns:
+        spins: (N,) int8 array of ±1 spins
+        mcs: MCS at which the snapshot was taken
+    """
+    header, records = open_configurations(filename)
+    record = records[index]
+    spins = np.unpackbits(record["bits"], count=header["N"]).astype(np.int8) * 2 - 1
+    return spins, int(record["mcs"])
+
+# ==============================================================================
+# TEXT FORMAT ("index spin" per line, 1-based indices)
+# ==============================================================================
+
+def read_text_configuration(filename):
+    """
+    Read a configuration in the "index spin" text format.
+
+    Parameters:
+        filename: text file with one line per site
+
+    Returns:
+        spins: (N,) int8 array of ±1 spins, ordered by site index
+    """
+    data = parse_text_series(filename).astype(np.int64)
+    spins = np.zeros(len(data), dtype=np.int8)
+    spins[data[:, 0] - 1] = data[:, 1]
+    return spins
+
+def write_text_configuration(filename, spins, width=12):
+    """
+    Write a configuration in the "index spin" text format.
+
+    Each line is the 1-based site index and the spin, right-aligned in
+    columns of the given width (12 as in test_configuration.dat, 8 as in
+    mys1.dat). The lines are assembled as one byte array, digit by digit.
+
+    Parameters:
+        filename: output text file
+        spins: (N,) array of ±1 spins
+        width: width of each column
+    """
+    N = len(spins)
+    if len(str(N)) >= width:
+        raise ValueError(f"Column width {width} too small for {N} sites")
+    lines = np.full((N, 2 * width + 1), ord(" "), dtype=np.uint8)
+    lines[:, -1] = ord("\n")
+
+    # Index column: digits from the right, blanks instead of leading zeros
+    index = np.arange(1, N + 1)
+    for position in range(len(str(N))):
+        digit = index // 10**position
+        column = width - 1 - position
+        lines[:, column] = np.where(digit > 0, ord("0") + digit % 10, ord(" "))
+
+    # Spin column: " 1" or "-1"
+    lines[:, 2 * width - 1] = ord("1")
+    lines[:, 2 * width - 2] = np.where(np.asarray(spins) < 0, ord("-"), ord(" "))
+
+    with open(filename, "wb") as f:
+        f.write(lines.tobytes())
@@ -0,0 +1,299 @@
+"""
+Weighted couplings J_ij and external field h_i (random-bond models, fields,
+irregular graphs).
+
+The engines of ising.py only know the (N, z) neighbor array nbr, with J = 1
+on every bond and the same z for every site. Here the Hamiltonian is
+
+    E = -Σ_{<i,j>} J_ij S_i S_j - Σ_i h_i S_i
+
+with the couplings stored as a symmetric scipy.sparse CSR matrix J (row i
+holds the bonds of site i, so sites may have any number of neighbors) and
+a field vector h. Flipping S_i changes the energy by
+
+    ΔE = 2 S_i (Σ_j J_ij S_j + h_i)
+
+which is a sparse matrix-vector product per sublattice in sweep_couplings.
+
+Acceptance: if every J_ij and h_i is an integer multiple of one quantum q
+(±J spin glass, diluted magnet, integer or half-integer fields), ΔE only
+takes the values 2 q k with |k| <= max_i (Σ_j |J_ij| + |h_i|) / q, and the
+acceptance is tabulated as in precompute_acceptance. Otherwise (e.g.
+Gaussian couplings) exp(-β ΔE) is evaluated for every attempted flip.
+
+Uniform couplings (J = 1 on every bond, h = 0, same number of neighbors)
+are recognized by uniform_nbr, and run_simulation then uses the nbr
+engines unchanged, at their full speed.
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix
+
+MAX_LEVELS = 4097          # largest acceptance table (number of ΔE values)
+MAX_DENOMINATOR = 12       # quantum q = smallest |J| or |h| divided by 1 .. 12
+
+# ==============================================================================
+# COUPLING MATRIX
+# ==============================================================================
+
+class Couplings:
+    """
+    Symmetric couplings J_ij (CSR) and external field h_i of N sites.
+
+    Usage:
+        couplings = random_bond_couplings(create_nbr(L), rng, h=0.1)
+        run_simulation(L, T, n_MCS, n_meas, couplings=couplings)
+    """
+
+    def __init__(self, J, h=0.0):
+        """
+        Parameters:
+            J: (N, N) symmetric scipy.sparse matrix (or array) of couplings,
+                zero diagonal
+            h: field, scalar or (N,) array
+        """
+        J = coo_matrix(J).tocsr()
+        J.sum_duplicates()
+        J.eliminate_zeros()
+        if J.shape[0] != J.shape[1]:
+            raise ValueError("The coupling matrix must be square")
+        if abs(J - J.T).max() > 1e-12 * max(1.0, abs(J).max()):
+            raise ValueError("The coupling matrix must be symmetric")
+        if np.any(J.diagonal() != 0):
+            raise ValueError("The coupling matrix must have a zero diagonal")
+        self.J = J.astype(np.float64)
+        self.N = J.shape[0]
+        self.h = np.broadcast_to(np.asarray(h, dtype=np.float64), (self.N,)).copy()
+
+    def degrees(self):
+        """Number of bonds of every site, (N,) int array."""
+        return np.diff(self.J.indptr)
+
+def from_nbr(nbr, J=1.0, h=0.0):
+    """
+    Couplings on the bonds of a neighbor array.
+
+    Parameters:
+        nbr: (N, z) neighbor array (see geometry.py)
+        J: coupling, scalar or (N, z) array with J[i, k] the coupling of the
+            bond from i to nbr[i, k] (must be symmetric)
+        h: field, scalar or (N,) array
+
+    Returns:
+        couplings: Couplings
+    """
+    N, z = nbr.shape
+    data = np.broadcast_to(np.asarray(J, dtype=np.float64), (N, z)).ravel()
+    rows = np.repeat(np.arange(N), z)
+    return Couplings(coo_matrix((data, (rows, nbr.ravel())), shape=(N, N)), h)
+
+def from_bonds(N, i, j, J=1.0, h=0.0):
+    """
+    Couplings from a list of undirected bonds (each bond given once).
+
+    Parameters:
+        N: number of sites
+        i, j: (n_bonds,) int arrays of the two sites of every bond
+        J: coupling, scalar or (n_bonds,) array
+        h: field, scalar or (N,) array
+
+    Returns:
+        couplings: Couplings
+    """
+    i = np.asarray(i)
+    j = np.asarray(j)
+    data = np.broadcast_to(np.asarray(J, dtype=np.float64), i.shape)
+    J_matrix = coo_matrix((np.concatenate([data, data]),
+                           (np.concatenate([i, j]), np.concatenate([j, i]))), shape=(N, N))
+    return Couplings(J_matrix, h)
+
+def random_bond_couplings(nbr, rng, p_negative=0.5, h=0.0):
+    """
+    ±J couplings on the bonds of a neighbor array (Edwards-Anderson spin glass).
+
+    Parameters:
+        nbr: (N, z) neighbor array
+        rng: numpy.random.Generator
+        p_negative: probability of J = -1 on each bond
+        h: field, scalar or (N,) array
+
+    Returns:
+        couplings: Couplings
+    """
+    N, z = nbr.shape
+    i = np.repeat(np.arange(N), z)
+    j = nbr.ravel()
+    once = i < j                       # every bond appears as (i, j) and (j, i)
+    i, j = i[once], j[once]
+    J = np.where(rng.random(i.size) < p_negative, -1.0, 1.0)
+    return from_bonds(N, i, j, J, h)
+
+def uniform_nbr(couplings):
+    """
+    Neighbor array of uniform couplings, for the fast nbr engines.
+
+    Parameters:
+        couplings: Couplings
+
+    Returns:
+        nbr: (N, z) neighbor array if J = 1 on every bond, h = 0 and every
+            site has z neighbors; None otherwise
+    """
+    degrees = couplings.degrees()
+    if (couplings.N == 0 or np.any(couplings.h != 0) or np.any(couplings.J.data != 1.0)
+            or np.any(degrees != degrees[0])):
+        return None
+    J = couplings.J.sorted_indices()
+    return J.indices.reshape(couplings.N, degrees[0]).astype(np.int64)
+
+# ==============================================================================
+# SUBLATTICES, ACCEPTANCE AND MEASUREMENT
+# ==============================================================================
+
+def coupling_sublattices(couplings):
+    """
+    Split the sites into sublattices without bonds inside each one.
+
+    Same coloring as ising.checkerboard_sublattices (two colors by breadth-
+    first search, greedy coloring if the graph is not bipartite), on the
+    bonds of the coupling matrix.
+
+    Parameters:
+        couplings: Couplings
+
+    Returns:
+        sublattices: list of (sites, J_rows, h_sites) per sublattice, with
+            J_rows = J[sites] (CSR rows) and h_sites = h[sites]
+    """
+    J, N = couplings.J, couplings.N
+    color = np.full(N, -1, dtype=np.int8)
+
+    # Breadth-first two-coloring, one whole frontier at a time
+    while np.any(color < 0):
+        start = np.argmax(color < 0)
+        color[start] = 0
+        frontier = np.array([start])
+        while frontier.size > 0:
+            rows = J[frontier]
+            neighbors = rows.indices
+            new_color = np.repeat(1 - color[frontier], np.diff(rows.indptr))
+            unseen = color[neighbors] < 0
+            color[neighbors[unseen]] = new_color[unseen]
+            frontier = np.unique(neighbors[unseen])
+
+    owner = np.repeat(np.arange(N), couplings.degrees())
+    if np.any(color[J.indices] == color[owner]):
+        # Not bipartite: greedy coloring, site by site
+        color[:] = -1
+        for i in range(N):
+            used = set(color[J.indices[J.indptr[i]:J.indptr[i + 1]]].tolist())
+            c = 0
+            while c in used:
+                c += 1
+            color[i] = c
+
+    sublattices = []
+    for c in range(color.max() + 1):
+        sites = np.flatnonzero(color == c)
+        sublattices.append((sites, J[sites], couplings.h[sites]))
+    return sublattices
+
+def energy_quantum(couplings):
+    """
+    Largest q such that every J_ij and h_i is an integer multiple of it.
+
+    Parameters:
+        couplings: Couplings
+
+    Returns:
+        q: the quantum (1.0 without couplings or field), or None if the
+            values have no common quantum q >= min |value| / MAX_DENOMINATOR
+    """
+    values = np.abs(np.concatenate([couplings.J.data, couplings.h]))
+    values = values[values > 0]
+    if values.size == 0:
+        return 1.0
+    for denominator in range(1, MAX_DENOMINATOR + 1):
+        q = values.min() / denominator
+        if np.allclose(values / q, np.rint(values / q), rtol=0.0, atol=1e-9):
+            return q
+    return None
+
+def precompute_coupling_acceptance(beta, couplings, max_levels=MAX_LEVELS):
+    """
+    Tabulate min(1, exp(-β ΔE)) if ΔE takes few enough values.
+
+    Parameters:
+        beta: 1/T (inverse temperature)
+        couplings: Couplings
+        max_levels: largest table size
+
+    Returns:
+        acceptance: (beta, table, q) for sweep_couplings; table[k + K] is the
+            acceptance of ΔE = 2 q k, or None (with q = None) if the
+            acceptance has to be computed for every flip
+    """
+    q = energy_quantum(couplings)
+    if q is None:
+        return beta, None, None
+    field_bound = np.asarray(abs(couplings.J).sum(axis=1)).ravel() + np.abs(couplings.h)
+    K = int(np.rint(field_bound.max(initial=0.0) / q))
+    if 2 * K + 1 > max_levels:
+        return beta, None, None
+    delta_E = 2.0 * q * np.arange(-K, K + 1)
+    return beta, np.minimum(1.0, np.exp(-beta * delta_E)), q
+
+def measure_couplings(spins, couplings):
+    """
+    Calculate E = -Σ_{<i,j>} J_ij S_i S_j - Σ_i h_i S_i and M = Σ_i S_i.
+
+    Parameters:
+        spins: (N,) array of ±1 spins
+        couplings: Couplings
+
+    Returns:
+        E: total energy (float)
+        M: total magnetization (int)
+    """
+    s = spins.astype(np.float64)
+    E = -0.5 * float(s @ (couplings.J @ s)) - float(couplings.h @ s)
+    return E, int(spins.sum(dtype=np.int64))
+
+# ==============================================================================
+# CHECKERBOARD UPDATE WITH COUPLINGS
+# ==============================================================================
+
+def sweep_couplings(spins, couplings, acceptance, sublattices, rng):
+    """
+    Perform one Monte Carlo Step (N attempted flips) sublattice by sublattice.
+
+    Same algorithm as ising.sweep_checkerboard, with the local field
+    Σ_j J_ij S_j + h_i of a whole sublattice as one sparse product.
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins (modified in-place)
+        couplings: Couplings
+        acceptance: (beta, table, q) from precompute_coupling_acceptance
+        sublattices: list from coupling_sublattices
+        rng: numpy.random.Generator or random_streams.RandomBlocks
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change of the accepted flips (float)
+        delta_M: total magnetization change of the accepted flips
+    """
+    beta, table, q = acceptance
+    total_delta_E = 0.0
+    total_delta_M = 0
+    for sites, J_rows, h_sites in sublattices:
+        spin_i = spins[sites]
+        delta_E = 2.0 * spin_i * (J_rows @ spins + h_sites)
+        if table is not None:
+            probability = table[np.rint(delta_E / (2.0 * q)).astype(np.int64) + len(table) // 2]
+        else:
+            probability = np.exp(-beta * np.maximum(delta_E, 0.0))
+        flip = rng.random(sites.size) < probability
+        spins[sites[flip]] *= -1
+        total_delta_E += float(delta_E[flip].sum())
+        total_delta_M -= 2 * int(spin_i[flip].sum(dtype=np.int64))
+    return spins, total_delta_E, total_delta_M
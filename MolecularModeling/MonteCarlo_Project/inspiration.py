@@ -3,6 +3,10 @@ import matplotlib.pyplot as plt
 from collections import defaultdict
 import time
 
+from autocorr import integrated_time
+from ising import checkerboard_sublattices, precompute_acceptance, sweep_checkerboard
+from random_streams import RandomBlocks, make_rng
+
 # ==============================================================================
 # TASK 1: INPUT - Parameters for the simulation (Required_Tasks 1.a)
 # ==============================================================================
@@ -13,6 +17,12 @@ These parameters control the Metropolis algorithm simulation:
 - n_MCS: total number of Monte Carlo Steps (1 MCS = N attempted spin flips)
 - n_meas: measurement frequency (measure every n_meas MCS)
 - seed: random number generator seed for reproducibility
+- engine: "random" (step_once, the reference) or "checkerboard" (vectorized
+  sublattice sweeps from ising.py, much faster, same equilibrium averages)
+- check_period: E and M are tracked from the accepted flips; every
+  check_period MCS they are compared with a full recomputation
+- generator: random number generator used by the update ("pcg64", "philox",
+  "sfc64" or "mt19937", see random_streams.py)
 """
 
 # Example parameters - can be modified for different tests
@@ -22,6 +32,9 @@ T = 2.0                   # Temperature
 n_MCS = 10000             # Total Monte Carlo steps
 n_meas = 25               # Measure every 25 MCS
 seed = 42                 # Random seed
+engine = "random"         # Update engine: "random" or "checkerboard"
+check_period = 1000       # Recompute E, M from scratch every check_period MCS (0 = never)
+generator = "pcg64"       # Random number generator of the MC update
 
 np.random.seed(seed)
 
@@ -119,7 +132,7 @@ def calc_energy(state, nbr):
         for j in range(4):  # 4 neighbors in 2D square lattice
             neighbor_sum += state[nbr[i, j]]
         # Contribution to energy: E_i = -S_i * Σ_j S_j
-        energy += spin_i * neighbor_sum
+        energy -= spin_i * neighbor_sum
     
     # Each pair counted twice (once for each spin in the pair)
     return energy / 2
@@ -151,7 +164,7 @@ print(f"Initial magnetization: {test_mag}")
 Required_Tasks 1.d: Monte Carlo update (Metropolis algorithm)
 
 Implements:
-1. Random spin selection
+1. Random spin selection (site and uniform drawn in blocks by the caller)
 2. Energy change calculation (only needs 4 neighbors)
 3. Metropolis acceptance: accept if ΔE < 0 or with probability exp(-βΔE)
 
@@ -161,28 +174,36 @@ This function is GEOMETRY-INDEPENDENT:
 - Same code as long as neighbor array is correctly defined
 """
 
-def step_once(current_state, nbr, beta):
+def step_once(current_state, nbr, beta, flip_index, uniform):
     """
     Perform one Monte Carlo step (one attempted spin flip).
     
     Uses Metropolis algorithm with Glauert dynamics:
-    1. Choose random spin
+    1. Take the random spin flip_index
     2. Calculate energy cost of flipping: ΔE = 2 * S_i * Σ_j S_j
     3. Accept if ΔE < 0 (energy decreases)
-       OR with probability exp(-β*ΔE) (thermal fluctuation)
+       OR with probability exp(-β*ΔE) (thermal fluctuation),
+       i.e. if uniform < exp(-β*ΔE)
+    
+    The random site and uniform number are passed in, so that the main loop
+    can draw them for a whole MCS at once instead of calling the random
+    number generator twice per flip.
+    
+    The changes of E and M are returned so the main loop can keep running
+    totals instead of calling calc_energy at every measurement.
     
     Parameters:
         current_state: (N,) array of ±1 spins
         nbr: (N, 4) neighbor array
         beta: 1/T (inverse temperature)
+        flip_index: random site in [0, N)
+        uniform: random number in [0, 1)
     
     Returns:
         current_state: Updated spin configuration (modified in-place)
+        delta_E: energy change (0 if the flip was rejected)
+        delta_M: magnetization change (0 if the flip was rejected)
     """
-    N = len(current_state)
-    
-    # Choose random spin to flip
-    flip_index = np.random.randint(0, N)
     spin_i = current_state[flip_index]
     
     # Calculate energy difference if we flip this spin
@@ -192,10 +213,11 @@ def step_once(current_state, nbr, beta):
     delta_E = 2 * spin_i * neighbor_sum
     
     # Metropolis acceptance criterion
-    if (delta_E < 0) or (np.random.rand() < np.exp(-beta * delta_E)):
+    if (delta_E < 0) or (uniform < np.exp(-beta * delta_E)):
         current_state[flip_index] *= -1  # Accept flip
+        return current_state, delta_E, -2 * spin_i
     
-    return current_state
+    return current_state, 0, 0
 
 
 # ==============================================================================
@@ -222,27 +244,58 @@ energy_series = np.zeros(n_measurements)
 mag_series = np.zeros(n_measurements)
 mcs_steps = np.arange(n_measurements) * n_meas
 
+# Random numbers of the update, drawn in blocks from the selected generator
+rng = make_rng(seed, generator)
+blocks = RandomBlocks(rng, N)
+
+# Setup for the checkerboard engine (sublattices and acceptance table)
+if engine == "checkerboard":
+    sublattices = checkerboard_sublattices(nbr)
+    acceptance = precompute_acceptance(beta, nbr.shape[1])
+elif engine != "random":
+    raise ValueError(f"Unknown update engine: {engine}")
+
+# Running totals of E and M (Required_Tasks 1.e), updated after every
+# accepted flip, so a measurement only copies two numbers
+energy = calc_energy(spins, nbr)
+magnetization = calc_magnetization(spins)
+
 # Timing for performance (Required_Tasks 2: speed)
 start_time = time.time()
 total_flips = 0
 
 # Main MC loop
 for mcs_step in range(n_MCS):
-    # One MCS = N attempted spin flips (random updating)
-    for _ in range(N):
-        spins = step_once(spins, nbr, beta)
-        total_flips += 1
+    if engine == "checkerboard":
+        # One MCS = one sweep over every sublattice (N attempted spin flips)
+        spins, delta_E, delta_M = sweep_checkerboard(spins, nbr, acceptance, sublattices, blocks)
+        energy += delta_E
+        magnetization += delta_M
+        total_flips += N
+    else:
+        # One MCS = N attempted spin flips (random updating)
+        flip_sites = blocks.sites(N).tolist()
+        uniforms = blocks.random(N).tolist()
+        for k in range(N):
+            spins, delta_E, delta_M = step_once(spins, nbr, beta, flip_sites[k], uniforms[k])
+            energy += delta_E
+            magnetization += delta_M
+            total_flips += 1
+    
+    # Consistency check: running totals against a full recomputation
+    if check_period and (mcs_step + 1) % check_period == 0:
+        if energy != calc_energy(spins, nbr) or magnetization != calc_magnetization(spins):
+            raise RuntimeError(f"Running E/M drifted from the spin configuration at MCS {mcs_step + 1}")
     
     # Measure observables every n_meas steps
     if (mcs_step + 1) % n_meas == 0:
         measurement_idx = (mcs_step + 1) // n_meas - 1
-        energy_series[measurement_idx] = calc_energy(spins, nbr)
-        mag_series[measurement_idx] = calc_magnetization(spins)
+        energy_series[measurement_idx] = energy
+        mag_series[measurement_idx] = magnetization
     
     # Progress indicator
     if (mcs_step + 1) % (n_MCS // 10) == 0:
-        current_energy = calc_energy(spins, nbr)
-        print(f"MCS {mcs_step + 1}/{n_MCS}: E = {current_energy:.2f}, |M| = {abs(mag_series[(mcs_step + 1) // n_meas - 1])}")
+        print(f"MCS {mcs_step + 1}/{n_MCS}: E = {energy:.2f}, |M| = {abs(magnetization)}")
 
 elapsed_time = time.time() - start_time
 
@@ -408,5 +461,9 @@ print(f"SUMMARY")
 print(f"{'='*70}")
 print(f"Final <E>/N: {final_energy_norm:.6f} ± {energy_errors[-1]/N:.6e}")
 print(f"Mean <|M|>/N: {final_mag:.6f} ± {mag_errors[-1]/N:.6e}")
-print(f"Autocorrelation length ≈ {bin_sizes[-1]} MCS")
+# Integrated autocorrelation times (autocorr.py), in MCS
+tau_E, tau_E_error, _ = integrated_time(energy_series)
+tau_M, tau_M_error, _ = integrated_time(np.abs(mag_series))
+print(f"Autocorrelation time of E:   {tau_E * n_meas:.1f} ± {tau_E_error * n_meas:.1f} MCS")
+print(f"Autocorrelation time of |M|: {tau_M * n_meas:.1f} ± {tau_M_error * n_meas:.1f} MCS")
 print(f"{'='*70}\n")
\ No newline at end of file
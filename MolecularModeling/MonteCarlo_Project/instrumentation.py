@@ -0,0 +1,249 @@
+"""
+Timers and counters for the Monte Carlo loop of run_simulation.
+
+inspiration.py only reports the overall flip rate at the end of a run. An
+Instrumentation object passed to run_simulation(instrumentation=...) records:
+
+- the time of every phase of the loop ("setup", "update", "check",
+  "measure", "snapshot", "checkpoint", "finish") with one lap timer: each
+  call of lap(phase) adds the nanoseconds since the previous call to that
+  phase, so the phases add up to the wall time of the run
+- attempted and accepted flips for every ΔE class of the Metropolis engines
+  ("checkerboard" and "random"; the sweeps fill a (2, 4z + 1) int64 array
+  with np.bincount, one call per sublattice)
+- the cost of a measurement (time of the "measure" and "check" phases per call)
+- optionally, the time of the random numbers of a sweep: every rng_every
+  MCS, the draws of one sweep are repeated on a copy of the generator (the
+  stream of the run is not touched) and timed
+
+Timers are plain Python integers from time.perf_counter_ns. record() returns
+everything as one JSON-serializable dict, and write_record appends it as one
+line to a JSON Lines file (one line per run; `python sweep.py --instrument
+runs.jsonl` writes one per job, which gives the acceptance per temperature).
+
+Without an Instrumentation object run_simulation only tests
+`instrumentation is not None` a few times per MCS (well below 1% of an MCS
+even at L = 8).
+
+Usage:
+    instrumentation = Instrumentation(rng_every=100)
+    run_simulation(L, T, n_MCS, n_meas, instrumentation=instrumentation)
+    write_record("runs.jsonl", instrumentation.record())
+"""
+
+import copy
+import json
+import time
+
+import numpy as np
+
+from random_streams import generator_of, random_bits32, random_sites
+
+PHASES = ("setup", "update", "check", "measure", "snapshot", "checkpoint", "rng_sample", "finish")
+
+# ==============================================================================
+# TIMERS AND COUNTERS
+# ==============================================================================
+
+class Instrumentation:
+    """Phase timers, ΔE acceptance counters and sampled random-number cost of one run."""
+
+    def __init__(self, rng_every=0):
+        """
+        Parameters:
+            rng_every: time the random numbers of one sweep every rng_every
+                MCS (0 = never)
+        """
+        self.rng_every = rng_every
+        self._reset()
+
+    def _reset(self):
+        self.info = {}
+        self.phase_ns = dict.fromkeys(PHASES, 0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.counts = None
+        self.offset = 0
+        self.rng_ns = 0
+        self.rng_samples = 0
+        self.n_MCS = 0
+        self.n_flipped = 0
+        self._last = None
+
+    def start(self, N, z, setup_start=None, **info):
+        """
+        Reset the counters at the start of a run; the first lap starts now.
+
+        Parameters:
+            N: number of sites
+            z: number of neighbors of each site (size of the ΔE table)
+            setup_start: time.perf_counter_ns() at the start of the setup,
+                which then counts as the "setup" phase
+            info: run parameters copied into the record (L, T, engine, ...)
+        """
+        self._reset()
+        self.info = dict(info, N=int(N), z=int(z))
+        self.counts = np.zeros((2, 4 * z + 1), dtype=np.int64)
+        self.offset = 2 * z
+        self._last = time.perf_counter_ns()
+        if setup_start is not None:
+            self.phase_ns["setup"] = self._last - setup_start
+            self.phase_calls["setup"] = 1
+
+    def lap(self, phase):
+        """Add the time since the previous lap to phase."""
+        now = time.perf_counter_ns()
+        self.phase_ns[phase] += now - self._last
+        self.phase_calls[phase] += 1
+        self._last = now
+
+    def sample_rng(self, rng, N, engine, integer_acceptance):
+        """
+        Time the random numbers of one sweep on a copy of the generator.
+
+        Parameters:
+            rng: numpy.random.Generator or random_streams.RandomBlocks of the run
+            N: number of sites
+            engine: "random" also draws N site indices
+            integer_acceptance: the sweep draws uint32 instead of uniforms
+        """
+        clone = copy.deepcopy(generator_of(rng))
+        start = time.perf_counter_ns()
+        if engine == "random":
+            random_sites(clone, N, N)
+        if integer_acceptance:
+            random_bits32(clone, N)
+        else:
+            clone.random(N)
+        self.rng_ns += time.perf_counter_ns() - start
+        self.rng_samples += 1
+        self.lap("rng_sample")
+
+    def stop(self, n_MCS, n_flipped):
+        """
+        Close the last lap ("finish") at the end of a run.
+
+        Parameters:
+            n_MCS: number of MCS done in this call (without resumed ones)
+            n_flipped: attempted flips (Metropolis) or flipped spins (cluster)
+        """
+        self.lap("finish")
+        self.n_MCS = int(n_MCS)
+        self.n_flipped = int(n_flipped)
+
+    # ==========================================================================
+    # STRUCTURED RECORD
+    # ==========================================================================
+
+    def record(self):
+        """
+        All timers and counters of the run.
+
+        Returns:
+            record: JSON-serializable dict with
+                "run": the run parameters given to start
+                "wall_time": seconds from start to stop
+                "phases": {phase: {"seconds", "calls", "fraction"}}
+                "flip_rate": attempted flips per second of the whole run, and
+                    "update_flip_rate" per second of the update phase
+                "acceptance": {"delta_E", "attempted", "accepted", "ratio"} per
+                    ΔE class and "overall" ratio (None if the engine has no
+                    ΔE classes)
+                "measurement": seconds per measurement and per check, and the
+                    fraction of the run spent measuring
+                "rng": sampled seconds of random numbers per MCS and the
+                    estimated fraction of the update phase (None if not sampled)
+        """
+        wall_ns = sum(self.phase_ns.values())
+        seconds = {phase: ns * 1e-9 for phase, ns in self.phase_ns.items()}
+        phases = {phase: dict(seconds=seconds[phase], calls=self.phase_calls[phase],
+                              fraction=self.phase_ns[phase] / wall_ns if wall_ns else 0.0)
+                  for phase in PHASES if self.phase_calls[phase]}
+
+        acceptance = None
+        attempted, accepted = self.counts if self.counts is not None else (None, None)
+        if attempted is not None and attempted.sum() > 0:
+            used = np.flatnonzero(attempted)
+            acceptance = dict(delta_E=(used - self.offset).tolist(),
+                              attempted=attempted[used].tolist(),
+                              accepted=accepted[used].tolist(),
+                              ratio=(accepted[used] / attempted[used]).tolist(),
+                              overall=float(accepted.sum() / attempted.sum()))
+
+        def per_call(phase):
+            calls = self.phase_calls[phase]
+            return seconds[phase] / calls if calls else None
+
+        rng = None
+        if self.rng_samples:
+            rng_per_MCS = self.rng_ns * 1e-9 / self.rng_samples
+            update_per_MCS = seconds["update"] / max(1, self.n_MCS)
+            rng = dict(seconds_per_MCS=rng_per_MCS, samples=self.rng_samples,
+                       update_fraction=rng_per_MCS / update_per_MCS if update_per_MCS else None)
+
+        return dict(run=self.info, wall_time=wall_ns * 1e-9, n_MCS=self.n_MCS,
+                    n_flipped=self.n_flipped, phases=phases,
+                    flip_rate=self.n_flipped / (wall_ns * 1e-9) if wall_ns else None,
+                    update_flip_rate=(self.n_flipped / seconds["update"]
+                                      if self.phase_ns["update"] else None),
+                    acceptance=acceptance,
+                    measurement=dict(seconds_per_measurement=per_call("measure"),
+                                     seconds_per_check=per_call("check"),
+                                     fraction=(self.phase_ns["measure"] + self.phase_ns["check"])
+                                     / wall_ns if wall_ns else 0.0),
+                    rng=rng)
+
+# ==============================================================================
+# OUTPUT
+# ==============================================================================
+
+def write_record(filename, record):
+    """
+    Append one record as a line of a JSON Lines file.
+
+    Parameters:
+        filename: output .jsonl file
+        record: dict from Instrumentation.record
+    """
+    with open(filename, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+def read_records(filename):
+    """
+    Read all records of a JSON Lines file.
+
+    Parameters:
+        filename: .jsonl file from write_record
+
+    Returns:
+        records: list of dicts
+    """
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def format_record(record):
+    """
+    One-screen text summary of a record.
+
+    Parameters:
+        record: dict from Instrumentation.record
+
+    Returns:
+        text: multi-line string
+    """
+    run = record["run"]
+    lines = [f"L={run.get('L')} T={run.get('T')} engine={run.get('engine')}: "
+             f"{record['n_MCS']} MCS in {record['wall_time']:.3f} s, "
+             f"{record['flip_rate'] or 0:.3e} flips/s"]
+    for phase, timing in record["phases"].items():
+        lines.append(f"  {phase:<11} {timing['seconds']:10.4f} s  {100 * timing['fraction']:5.1f}%  "
+                     f"({timing['calls']} calls)")
+    if record["acceptance"] is not None:
+        acceptance = record["acceptance"]
+        lines.append(f"  acceptance  {acceptance['overall']:.4f} overall")
+        for delta_E, attempted, ratio in zip(acceptance["delta_E"], acceptance["attempted"],
+                                             acceptance["ratio"]):
+            lines.append(f"    ΔE = {delta_E:+3d}: {ratio:.4f} of {attempted}")
+    if record["rng"] is not None:
+        lines.append(f"  random numbers ~{100 * (record['rng']['update_fraction'] or 0):.1f}% "
+                     f"of the update time")
+    return "\n".join(lines)
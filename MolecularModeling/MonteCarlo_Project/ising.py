@@ -0,0 +1,697 @@
+"""
+Importable building blocks for the Ising Monte Carlo project.
+
+inspiration.py is the reference script: it runs the random-updating
+Metropolis algorithm one spin flip at a time with step_once. The functions
+here are meant to be imported by that script and by the notebooks, and
+provide faster update engines that give the same equilibrium averages.
+
+Like step_once, every update engine only uses the neighbor array nbr,
+so they stay independent of the lattice geometry (Required_Tasks 1).
+"""
+
+import os
+import time
+
+import numpy as np
+
+import geometry as geometry_module
+from random_streams import (RandomBlocks, make_rng, precompute_thresholds, random_bits32,
+                            random_sites)
+
+# ==============================================================================
+# SUBLATTICE DECOMPOSITION
+# ==============================================================================
+"""
+Sites that are not neighbors of each other can be updated at the same time:
+the energy change of each flip only depends on its neighbors, which do not
+change while the sublattice is updated. For the square lattice these are the
+two colors of a checkerboard. The coloring is computed from nbr alone, so it
+also works for lattices that need more than two colors (e.g. triangular).
+"""
+
+def checkerboard_sublattices(nbr):
+    """
+    Split the sites into sublattices with no neighbors inside each one.
+
+    A two-coloring is tried first with a breadth-first search over the
+    neighbor array. If the lattice is not bipartite, a greedy coloring
+    is used instead.
+
+    Parameters:
+        nbr: (N, z) neighbor array
+
+    Returns:
+        sublattices: list of int arrays with the site indices of each sublattice
+    """
+    N = nbr.shape[0]
+    color = np.full(N, -1, dtype=np.int8)
+
+    # Breadth-first two-coloring, one whole frontier at a time
+    while np.any(color < 0):
+        start = np.argmax(color < 0)
+        color[start] = 0
+        frontier = np.array([start])
+        while frontier.size > 0:
+            neighbors = nbr[frontier]
+            new_color = np.broadcast_to(1 - color[frontier][:, None], neighbors.shape)
+            unseen = color[neighbors] < 0
+            color[neighbors[unseen]] = new_color[unseen]
+            frontier = np.unique(neighbors[unseen])
+
+    if np.all(color[nbr] != color[:, None]):
+        return [np.flatnonzero(color == c) for c in range(2)]
+
+    # Not bipartite: greedy coloring, site by site
+    color[:] = -1
+    for i in range(N):
+        used = set(color[nbr[i]].tolist())
+        c = 0
+        while c in used:
+            c += 1
+        color[i] = c
+    return [np.flatnonzero(color == c) for c in range(color.max() + 1)]
+
+# ==============================================================================
+# ACCEPTANCE TABLE
+# ==============================================================================
+
+def precompute_acceptance(beta, z):
+    """
+    Tabulate the Metropolis acceptance probability min(1, exp(-β ΔE)).
+
+    ΔE = 2 * S_i * Σ_j S_j takes the values -2z, -2z+4, ..., 2z, so the
+    table is indexed with ΔE + 2z.
+
+    Parameters:
+        beta: 1/T (inverse temperature)
+        z: number of neighbors of each site
+
+    Returns:
+        acceptance: (4z + 1,) array of acceptance probabilities
+    """
+    delta_E = np.arange(-2 * z, 2 * z + 1)
+    return np.minimum(1.0, np.exp(-beta * delta_E))
+
+# ==============================================================================
+# CHECKERBOARD UPDATE (vectorized Metropolis sweep)
+# ==============================================================================
+
+def sweep_checkerboard(spins, nbr, acceptance, sublattices, rng, counts=None):
+    """
+    Perform one Monte Carlo Step (N attempted flips) sublattice by sublattice.
+
+    All sites of a sublattice are updated at once with NumPy arrays. The
+    Metropolis criterion is the same as in step_once; only the order of the
+    attempted flips changes (sequential sublattices instead of random sites),
+    which leaves the equilibrium distribution unchanged.
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        acceptance: table from precompute_acceptance, or integer thresholds
+            from random_streams.precompute_thresholds
+        sublattices: list of site index arrays from checkerboard_sublattices
+        rng: numpy.random.Generator or random_streams.RandomBlocks
+        counts: optional (2, 4z + 1) int64 array; attempted and accepted
+            flips are added to counts[0] and counts[1] at index ΔE + 2z
+            (see instrumentation.py)
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change of the accepted flips
+        delta_M: total magnetization change of the accepted flips
+    """
+    offset = 2 * nbr.shape[1]
+    integer_acceptance = acceptance.dtype.kind == "i"
+    total_delta_E = 0
+    total_delta_M = 0
+    for sites in sublattices:
+        spin_i = spins[sites]
+        neighbor_sum = spins[nbr[sites]].sum(axis=1, dtype=np.int64)
+        delta_E = 2 * spin_i * neighbor_sum
+        if integer_acceptance:
+            draws = random_bits32(rng, sites.size)
+        else:
+            draws = rng.random(sites.size)
+        flip = draws < acceptance[delta_E + offset]
+        spins[sites[flip]] *= -1
+        if counts is not None:
+            counts[0] += np.bincount(delta_E + offset, minlength=counts.shape[1])
+            counts[1] += np.bincount(delta_E[flip] + offset, minlength=counts.shape[1])
+        # Sites of one sublattice are not neighbors, so the ΔE's simply add up
+        total_delta_E += int(delta_E[flip].sum())
+        total_delta_M -= 2 * int(spin_i[flip].sum(dtype=np.int64))
+    return spins, total_delta_E, total_delta_M
+
+def sweep_random(spins, nbr, acceptance, rng, counts=None):
+    """
+    Perform one Monte Carlo Step with random updating (N attempted flips).
+
+    Same algorithm as step_once in inspiration.py, kept as the reference
+    engine for run_simulation. It is slow: one Python iteration per flip.
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        acceptance: table from precompute_acceptance, or integer thresholds
+            from random_streams.precompute_thresholds
+        rng: numpy.random.Generator or random_streams.RandomBlocks
+        counts: optional (2, 4z + 1) int64 array of attempted and accepted
+            flips per ΔE, as in sweep_checkerboard
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change of the accepted flips
+        delta_M: total magnetization change of the accepted flips
+    """
+    N, z = nbr.shape
+    offset = 2 * z
+    # All random numbers of the sweep are drawn at once
+    sites = random_sites(rng, N, N)
+    if acceptance.dtype.kind == "i":
+        draws = random_bits32(rng, N)
+    else:
+        draws = rng.random(N)
+    table = acceptance.tolist()
+    # Counted in Python lists, added to counts once at the end
+    attempted = [0] * len(table)
+    accepted = [0] * len(table)
+    total_delta_E = 0
+    total_delta_M = 0
+    for i, u in zip(sites.tolist(), draws.tolist()):
+        spin_i = int(spins[i])
+        delta_E = 2 * spin_i * int(spins[nbr[i]].sum())
+        attempted[delta_E + offset] += 1
+        if u < table[delta_E + offset]:
+            spins[i] = -spin_i
+            accepted[delta_E + offset] += 1
+            total_delta_E += delta_E
+            total_delta_M -= 2 * spin_i
+    if counts is not None:
+        counts += np.array([attempted, accepted], dtype=np.int64)
+    return spins, total_delta_E, total_delta_M
+
+# ==============================================================================
+# BATCHED REPLICAS
+# ==============================================================================
+"""
+R independent replicas of the same lattice are stored as one (R, N) array
+and updated together: every sublattice update is one set of NumPy calls on
+(R, n_sites) arrays, sharing one neighbor table and one acceptance table.
+On small lattices this amortizes the per-call overhead that dominates a
+single checkerboard sweep. Each replica keeps its own random stream, so its
+trajectory does not depend on R or on the other replicas.
+"""
+
+def sweep_replicas(spins, nbr, acceptance, sublattices, rngs):
+    """
+    Perform one Monte Carlo Step of every replica, sublattice by sublattice.
+
+    Parameters:
+        spins: (R, N) int8 array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        acceptance: table from precompute_acceptance, or integer thresholds
+            from random_streams.precompute_thresholds
+        sublattices: list of site index arrays from checkerboard_sublattices
+        rngs: list of R numpy.random.Generator, one per replica
+
+    Returns:
+        spins: Updated spin configurations
+        delta_E: (R,) energy change of each replica
+        delta_M: (R,) magnetization change of each replica
+    """
+    R, N = spins.shape
+    offset = 2 * nbr.shape[1]
+    # The random numbers of the whole MCS, one generator call per replica
+    if acceptance.dtype.kind == "i":
+        draws = np.stack([random_bits32(rng, N) for rng in rngs])
+    else:
+        draws = np.empty((R, N))
+        for r, rng in enumerate(rngs):
+            rng.random(out=draws[r])
+
+    total_delta_E = np.zeros(R, dtype=np.int64)
+    total_delta_M = np.zeros(R, dtype=np.int64)
+    for sites in sublattices:
+        spin_i = spins[:, sites]
+        neighbor_sum = spins[:, nbr[sites]].sum(axis=2, dtype=np.int64)
+        delta_E = 2 * spin_i * neighbor_sum
+        flip = draws[:, sites] < acceptance[delta_E + offset]
+        spins[:, sites] = np.where(flip, -spin_i, spin_i)
+        total_delta_E += np.where(flip, delta_E, 0).sum(axis=1)
+        total_delta_M -= 2 * np.where(flip, spin_i, 0).sum(axis=1, dtype=np.int64)
+    return spins, total_delta_E, total_delta_M
+
+# ==============================================================================
+# LATTICE GEOMETRY AND MEASUREMENT
+# ==============================================================================
+
+def create_nbr(L, geometry="square"):
+    """
+    Build the neighbor array of a lattice with periodic boundary conditions.
+
+    For the 2D square lattice the layout is the same as create_nbr in
+    inspiration.py; see geometry.py for the other lattices.
+
+    Parameters:
+        L: linear size of lattice
+        geometry: name of a lattice in geometry.GEOMETRIES
+
+    Returns:
+        nbr: (N, z) array, e.g. nbr[i, :] = [right, left, above, below] for "square"
+    """
+    return geometry_module.create_nbr(L, geometry)
+
+def measure_observables(spins, nbr):
+    """
+    Calculate total energy E = -Σ_{<i,j>} S_i S_j and magnetization M = Σ_i S_i.
+
+    Parameters:
+        spins: (N,) array of ±1 spins
+        nbr: (N, z) neighbor array
+
+    Returns:
+        E: total energy (each pair counted once)
+        M: total magnetization
+    """
+    spins = spins.astype(np.int64)
+    E = -int(np.sum(spins[nbr] * spins[:, None])) // 2
+    M = int(spins.sum())
+    return E, M
+
+def measure_replicas(spins, nbr):
+    """
+    Energy and magnetization of every replica of an (R, N) spin array.
+
+    Parameters:
+        spins: (R, N) array of ±1 spins
+        nbr: (N, z) neighbor array
+
+    Returns:
+        E: (R,) int64 array of total energies
+        M: (R,) int64 array of total magnetizations
+    """
+    spins = spins.astype(np.int64)
+    E = -np.sum(spins[:, nbr] * spins[:, :, None], axis=(1, 2)) // 2
+    M = spins.sum(axis=1)
+    return E, M
+
+# ==============================================================================
+# FULL SIMULATION WITH MEASUREMENTS
+# ==============================================================================
+
+ENGINES = ("checkerboard", "random", "wolff", "swendsen-wang", "numba", "parallel")
+
+def run_simulation(L, T, n_MCS, n_meas, seed=None, engine="checkerboard",
+                   spins=None, nbr=None, check_period=1000, stats=None,
+                   store_series=True, energy_binning=None, mag_binning=None,
+                   checkpoint_file=None, checkpoint_interval=300.0,
+                   series_prefix=None, flush_every=10000, geometry="square",
+                   generator="pcg64", block_size=None, integer_acceptance=False,
+                   moments=None, snapshot_file=None, snapshot_every=1000, histogram=None,
+                   couplings=None, instrumentation=None):
+    """
+    Run the Metropolis simulation and return the E and M time series.
+
+    The measurement convention is the one of inspiration.py: a measurement
+    is taken after every n_meas MCS, so the series has n_MCS // n_meas points.
+
+    Parameters:
+        L: linear size of the lattice (ignored if nbr is given)
+        T: temperature
+        n_MCS: total number of Monte Carlo steps
+        n_meas: number of MCS between two measurements
+        seed: seed or numpy.random.SeedSequence for the random number generator
+        engine: "checkerboard", "random" (reference, slow), or the cluster
+            engines "wolff" and "swendsen-wang" from cluster.py (for Wolff,
+            one MCS = clusters until N spins have been flipped), or "numba":
+            the checkerboard sweep compiled in kernels.py (same results as
+            "checkerboard", NumPy fallback without Numba), or "parallel": the
+            multithreaded checkerboard sweep of kernels.py (own counter-based
+            random numbers, independent of the number of threads; always
+            uses integer acceptance)
+        spins: initial configuration (random if None); the "numba" and
+            "parallel" engines run on an int8 copy if it has another dtype
+        nbr: neighbor array (built with create_nbr(L, geometry) if None)
+        check_period: compare the running E, M with a full recomputation
+            every check_period MCS (0 = never)
+        stats: optional dict, filled with "n_flipped": attempted flips for
+            the Metropolis engines, flipped spins for the cluster engines
+        store_series: keep the time series in memory; set to False for
+            very long runs and use the binning accumulators instead
+        energy_binning: optional binning.BinningAccumulator fed with E
+        mag_binning: optional binning.BinningAccumulator fed with |M|
+        checkpoint_file: if given, the full state is saved there every
+            checkpoint_interval seconds and at the end of the run; if the
+            file exists, the run resumes from it (see checkpoint.py)
+        checkpoint_interval: seconds between two checkpoints
+        series_prefix: if given, E and M are written to memory-mapped
+            <prefix>_E.npy and <prefix>_M.npy files with the smallest exact
+            integer dtype (see series_io.py) instead of being kept in memory
+        flush_every: number of measurements between two flushes of those files
+        geometry: lattice used when nbr is None (see geometry.py)
+        generator: bit generator, one of random_streams.BIT_GENERATORS
+        block_size: if given, the Metropolis engines draw their random
+            numbers from random_streams.RandomBlocks of this size
+        integer_acceptance: accept flips by comparing random uint32 with
+            integer thresholds instead of uniforms with probabilities
+        moments: optional binning.MomentAccumulator fed with E and M, for
+            C_v, χ and the Binder cumulant (see jackknife.py)
+        snapshot_file: if given, the spins are appended to this bit-packed
+            configuration file every snapshot_every MCS (see configurations.py)
+        snapshot_every: number of MCS between two snapshots
+        histogram: optional reweighting.HistogramAccumulator fed with E and
+            M, for reweighting to nearby temperatures
+        couplings: optional couplings.Couplings (bond couplings J_ij and
+            field h_i) instead of nbr; uniform couplings run on the nbr
+            engines, others only with the checkerboard engine, float
+            energies and without series_prefix, histogram and
+            integer_acceptance
+        instrumentation: optional instrumentation.Instrumentation, filled
+            with phase timers, ΔE acceptance counters and measurement costs
+
+    Returns:
+        spins: final spin configuration
+        energies: (n_MCS // n_meas,) int64 array of E (None if not stored)
+        magnetizations: (n_MCS // n_meas,) int64 array of M (None if not stored)
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown update engine: {engine}")
+
+    setup_start = time.perf_counter_ns()
+    rng = make_rng(seed, generator)
+    if couplings is not None:
+        from couplings import (coupling_sublattices, measure_couplings,
+                               precompute_coupling_acceptance, sweep_couplings, uniform_nbr)
+        if uniform_nbr(couplings) is not None:
+            # J = 1 and h = 0: the fast nbr engines
+            nbr, couplings = uniform_nbr(couplings), None
+        elif (engine != "checkerboard" or series_prefix is not None or histogram is not None
+              or integer_acceptance):
+            raise ValueError("Non-uniform couplings need the checkerboard engine, without "
+                             "series_prefix, histogram and integer_acceptance")
+    if nbr is None and couplings is None:
+        nbr = create_nbr(L, geometry)
+    N = nbr.shape[0] if couplings is None else couplings.N
+    if spins is None:
+        spins = rng.choice(np.array([-1, 1], dtype=np.int8), size=N)
+    draws = RandomBlocks(rng, N, block_size) if block_size else rng
+
+    beta = 1.0 / T
+    if engine == "parallel":
+        integer_acceptance = True
+    if couplings is not None:
+        acceptance = precompute_coupling_acceptance(beta, couplings)
+    elif integer_acceptance:
+        acceptance = precompute_thresholds(beta, nbr.shape[1])
+    else:
+        acceptance = precompute_acceptance(beta, nbr.shape[1])
+    if couplings is not None:
+        sublattices = coupling_sublattices(couplings)
+    elif engine in ("checkerboard", "numba", "parallel"):
+        sublattices = checkerboard_sublattices(nbr)
+    else:
+        sublattices = None
+    if engine in ("numba", "parallel"):
+        import kernels
+        # The compiled kernels only take int8 spins (the NumPy engines take any
+        # integer dtype, e.g. the int64 spins of inspiration.py)
+        spins = np.ascontiguousarray(spins, dtype=np.int8)
+        nbr = np.ascontiguousarray(nbr)
+        if engine == "parallel":
+            sublattices = kernels.parallel_sublattices(sublattices)
+        elif kernels.BACKEND != "numpy":
+            sublattices = np.concatenate(sublattices)
+    if engine in ("wolff", "swendsen-wang"):
+        from cluster import sweep_swendsen_wang, sweep_wolff
+        sweep_cluster = sweep_wolff if engine == "wolff" else sweep_swendsen_wang
+    n_flipped = 0
+
+    n_measurements = n_MCS // n_meas
+    if series_prefix is not None:
+        import series_io
+        store_series = True
+        if checkpoint_file is not None and os.path.exists(checkpoint_file):
+            energies, magnetizations = series_io.open_series(series_prefix, mode="r+")
+        else:
+            energies, magnetizations = series_io.create_series(series_prefix, n_measurements,
+                                                               N, nbr.shape[1])
+    elif store_series:
+        energies = np.zeros(n_measurements, dtype=np.int64 if couplings is None else np.float64)
+        magnetizations = np.zeros(n_measurements, dtype=np.int64)
+    else:
+        energies = magnetizations = None
+
+    def measure(spins):
+        if couplings is not None:
+            return measure_couplings(spins, couplings)
+        return measure_observables(spins, nbr)
+    # Running float energies (general couplings) may differ from a
+    # recomputation by rounding
+    tolerance = 0 if couplings is None else 1e-9 * N
+    E, M = measure(spins)
+    first_step = 0
+
+    if checkpoint_file is not None:
+        import checkpoint
+        accumulators = {name: acc for name, acc in (("E", energy_binning), ("M", mag_binning),
+                                                    ("moments", moments), ("histogram", histogram))
+                        if acc is not None}
+        params_hash = checkpoint.parameter_hash(nbr=nbr, T=T, n_MCS=n_MCS, n_meas=n_meas,
+                                                seed=seed, engine=engine, store_series=store_series,
+                                                binning=sorted(accumulators), generator=generator,
+                                                block_size=block_size,
+                                                integer_acceptance=integer_acceptance,
+                                                **({} if couplings is None else dict(
+                                                    J_indptr=couplings.J.indptr,
+                                                    J_indices=couplings.J.indices,
+                                                    J_data=couplings.J.data, h=couplings.h)))
+        if os.path.exists(checkpoint_file):
+            state = checkpoint.load_checkpoint(checkpoint_file, params_hash)
+            spins[:] = state["spins"]
+            rng.bit_generator.state = state["rng_state"]
+            if block_size:
+                draws.set_state(state["blocks"])
+            first_step, E, M, n_flipped = state["mcs_done"], state["E"], state["M"], state["n_flipped"]
+            if store_series and series_prefix is None:
+                energies[:] = state["energies"]
+                magnetizations[:] = state["magnetizations"]
+            for name, accumulator in accumulators.items():
+                accumulator.set_state(state["binning"][name])
+
+        def save(mcs_done):
+            # Series on disk are flushed instead of copied into the checkpoint
+            if series_prefix is not None:
+                energies.flush()
+                magnetizations.flush()
+                saved_series = (None, None)
+            else:
+                saved_series = (energies, magnetizations)
+            checkpoint.save_checkpoint(checkpoint_file, params_hash, spins, draws, mcs_done, E, M,
+                                       n_flipped, *saved_series, accumulators)
+        last_checkpoint = time.time()
+
+    if snapshot_file is not None:
+        import configurations
+        if first_step > 0 and os.path.exists(snapshot_file):
+            # Snapshots taken after the checkpoint are taken again
+            configurations.truncate_configurations(snapshot_file, first_step)
+        else:
+            configurations.create_configurations(snapshot_file, N, L, geometry, T, seed)
+
+    counts = None
+    if instrumentation is not None:
+        instrumentation.start(N, nbr.shape[1] if couplings is None else 0, setup_start,
+                              L=L, T=T, engine=engine, n_MCS=n_MCS, n_meas=n_meas,
+                              first_step=first_step, couplings=couplings is not None)
+        # ΔE classes of the engines that count them
+        if engine in ("checkerboard", "random") and couplings is None:
+            counts = instrumentation.counts
+        # Random numbers are only sampled for the engines that draw one per site
+        rng_every = instrumentation.rng_every if engine in ("checkerboard", "random", "numba") else 0
+        n_flipped_start = n_flipped
+
+    for mcs_step in range(first_step, n_MCS):
+        if instrumentation is not None and rng_every and mcs_step % rng_every == 0:
+            instrumentation.sample_rng(draws, N, engine, integer_acceptance)
+        if couplings is not None:
+            _, delta_E, delta_M = sweep_couplings(spins, couplings, acceptance, sublattices, draws)
+            n_flipped += N
+        elif engine == "checkerboard":
+            _, delta_E, delta_M = sweep_checkerboard(spins, nbr, acceptance, sublattices, draws, counts)
+            n_flipped += N
+        elif engine == "numba":
+            _, delta_E, delta_M = kernels.sweep_checkerboard(spins, nbr, acceptance, sublattices, draws)
+            n_flipped += N
+        elif engine == "parallel":
+            _, delta_E, delta_M = kernels.sweep_parallel(spins, nbr, acceptance, sublattices, draws)
+            n_flipped += N
+        elif engine == "random":
+            _, delta_E, delta_M = sweep_random(spins, nbr, acceptance, draws, counts)
+            n_flipped += N
+        else:
+            _, delta_E, delta_M, flipped = sweep_cluster(spins, nbr, beta, rng)
+            n_flipped += flipped
+        E += delta_E
+        M += delta_M
+        if instrumentation is not None:
+            instrumentation.lap("update")
+
+        if check_period and (mcs_step + 1) % check_period == 0:
+            E_check, M_check = measure(spins)
+            if M != M_check or abs(E - E_check) > tolerance:
+                raise RuntimeError(f"Running E/M drifted from the spin configuration at MCS {mcs_step + 1}")
+            if instrumentation is not None:
+                instrumentation.lap("check")
+
+        if (mcs_step + 1) % n_meas == 0:
+            if store_series:
+                idx = (mcs_step + 1) // n_meas - 1
+                energies[idx] = E
+                magnetizations[idx] = M
+                if series_prefix is not None and (idx + 1) % flush_every == 0:
+                    energies.flush()
+                    magnetizations.flush()
+            if energy_binning is not None:
+                energy_binning.add(E)
+            if mag_binning is not None:
+                mag_binning.add(abs(M))
+            if moments is not None:
+                moments.add(E, M)
+            if histogram is not None:
+                histogram.add(E, M)
+            if instrumentation is not None:
+                instrumentation.lap("measure")
+        if snapshot_file is not None and (mcs_step + 1) % snapshot_every == 0:
+            configurations.append_configurations(snapshot_file, spins, mcs_step + 1)
+            if instrumentation is not None:
+                instrumentation.lap("snapshot")
+
+        if checkpoint_file is not None and time.time() - last_checkpoint > checkpoint_interval:
+            save(mcs_step + 1)
+            last_checkpoint = time.time()
+            if instrumentation is not None:
+                instrumentation.lap("checkpoint")
+
+    if checkpoint_file is not None:
+        save(n_MCS)
+    if series_prefix is not None:
+        energies.flush()
+        magnetizations.flush()
+    if stats is not None:
+        stats["n_flipped"] = n_flipped
+    if instrumentation is not None:
+        instrumentation.stop(n_MCS - first_step, n_flipped - n_flipped_start)
+    return spins, energies, magnetizations
+
+# ==============================================================================
+# BINNING ANALYSIS
+# ==============================================================================
+
+def binning_analysis(data, max_bin_size=None):
+    """
+    Perform binning analysis on time series data (Required_Tasks 3).
+
+    Same results as binning_analysis in inspiration.py. Each level is built
+    from the previous one by averaging pairs of bins, which is vectorized.
+
+    Parameters:
+        data: (n_measurements,) time series array
+        max_bin_size: maximum bin size (~100 bins should remain)
+
+    Returns:
+        bin_sizes: array of bin sizes (powers of 2)
+        bin_errors: standard error for each bin size
+        bin_means: mean value from binned data
+    """
+    current = np.asarray(data, dtype=np.float64)
+    if max_bin_size is None:
+        max_bin_size = max(1, len(current) // 100)
+
+    bin_sizes = []
+    bin_errors = []
+    bin_means = []
+
+    m = 1
+    while m <= max_bin_size and len(current) >= 2:
+        bin_sizes.append(m)
+        bin_means.append(np.mean(current))
+        bin_errors.append(np.std(current, ddof=1) / np.sqrt(len(current)))
+
+        # Pairs of bins of size m become bins of size 2m
+        limit = len(current) // 2 * 2
+        current = (current[:limit:2] + current[1:limit:2]) / 2.0
+        m *= 2
+
+    return np.array(bin_sizes), np.array(bin_errors), np.array(bin_means)
+
+# ==============================================================================
+# INDEPENDENT REPLICAS IN ONE RUN
+# ==============================================================================
+
+def run_replicas(L, T, n_MCS, n_meas, R, seed=None, nbr=None, geometry="square",
+                 generator="pcg64", integer_acceptance=False, check_period=1000):
+    """
+    Run R independent checkerboard simulations at once with sweep_replicas.
+
+    Replaces R sequential calls of run_simulation (e.g. to get error bars
+    from independent runs): the lattice, the sublattices and the acceptance
+    table are built once, and each MCS is one batched update. Replica r uses
+    the r-th child of numpy.random.SeedSequence(seed).
+
+    Parameters:
+        L: linear size of the lattice (ignored if nbr is given)
+        T: temperature
+        n_MCS: total number of Monte Carlo steps
+        n_meas: number of MCS between two measurements
+        R: number of replicas
+        seed: master seed or numpy.random.SeedSequence
+        nbr: neighbor array (built with create_nbr(L, geometry) if None)
+        geometry: lattice used when nbr is None (see geometry.py)
+        generator: bit generator, one of random_streams.BIT_GENERATORS
+        integer_acceptance: accept flips with integer thresholds
+        check_period: compare the running E, M with a full recomputation
+            every check_period MCS (0 = never)
+
+    Returns:
+        spins: (R, N) final spin configurations
+        energies: (R, n_MCS // n_meas) int64 array of E
+        magnetizations: (R, n_MCS // n_meas) int64 array of M
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    rngs = [make_rng(child, generator) for child in seed.spawn(R)]
+    if nbr is None:
+        nbr = create_nbr(L, geometry)
+    N = nbr.shape[0]
+    spins = np.stack([rng.choice(np.array([-1, 1], dtype=np.int8), size=N) for rng in rngs])
+
+    beta = 1.0 / T
+    if integer_acceptance:
+        acceptance = precompute_thresholds(beta, nbr.shape[1])
+    else:
+        acceptance = precompute_acceptance(beta, nbr.shape[1])
+    sublattices = checkerboard_sublattices(nbr)
+
+    n_measurements = n_MCS // n_meas
+    energies = np.zeros((R, n_measurements), dtype=np.int64)
+    magnetizations = np.zeros((R, n_measurements), dtype=np.int64)
+    E, M = measure_replicas(spins, nbr)
+
+    for mcs_step in range(n_MCS):
+        _, delta_E, delta_M = sweep_replicas(spins, nbr, acceptance, sublattices, rngs)
+        E += delta_E
+        M += delta_M
+
+        if check_period and (mcs_step + 1) % check_period == 0:
+            E_check, M_check = measure_replicas(spins, nbr)
+            if np.any(E != E_check) or np.any(M != M_check):
+                raise RuntimeError(f"Running E/M drifted from the spin configurations at MCS {mcs_step + 1}")
+
+        if (mcs_step + 1) % n_meas == 0:
+            idx = (mcs_step + 1) // n_meas - 1
+            energies[:, idx] = E
+            magnetizations[:, idx] = M
+
+    return spins, energies, magnetizations
@@ -0,0 +1,104 @@
+"""
+Jackknife errors of derived observables (Required_Tasks 8).
+
+The specific heat, susceptibility and Binder cumulant are non-linear
+functions of averages, so their errors cannot be taken from the binning
+analysis of a single series. With the bin averages of E, E², |M|, M², M⁴
+from binning.MomentAccumulator (n_b bins of length much longer than the
+autocorrelation time), the jackknife works on the bin sums alone:
+
+    θ_i   = f(moments without bin i)                  i = 1 .. n_b
+    θ_J   = n_b f(all) - (n_b - 1) mean(θ_i)          bias-corrected estimate
+    σ_J²  = (n_b - 1) / n_b Σ (θ_i - mean(θ_i))²
+
+Per site, with β = 1/T:
+    e      = <E> / N
+    m      = <|M|> / N
+    C_v    = β² (<E²> - <E>²) / N
+    χ      = β (<M²> - <|M|>²) / N
+    U_4    = 1 - <M⁴> / (3 <M²>²)
+
+Everything is vectorized over leading axes, so all temperatures of a sweep
+(bins of shape (n_T, n_b, 5)) are handled in one call.
+"""
+
+import numpy as np
+
+from binning import MOMENTS
+
+# ==============================================================================
+# GENERIC JACKKNIFE
+# ==============================================================================
+
+def jackknife(bins, estimator):
+    """
+    Jackknife estimate and error of a function of bin averages.
+
+    Parameters:
+        bins: (..., n_bins, n_moments) array of bin averages
+        estimator: function of an array of averages (..., n_moments),
+            returning an array of shape (...); it is also called with one
+            extra leading axis (n_bins, ..., n_moments) for the leave-one-out
+            averages, which plain broadcasting handles
+
+    Returns:
+        value: (...) bias-corrected estimate
+        error: (...) jackknife error
+    """
+    bins = np.asarray(bins, dtype=np.float64)
+    n_bins = bins.shape[-2]
+    if n_bins < 2:
+        raise ValueError("The jackknife needs at least 2 bins")
+
+    total = bins.sum(axis=-2)
+    full = estimator(total / n_bins)
+    # Bin axis first, so the estimator broadcasts against (...)-shaped parameters
+    leave_one_out = estimator((total - np.moveaxis(bins, -2, 0)) / (n_bins - 1))
+
+    mean_leave_one_out = leave_one_out.mean(axis=0)
+    value = n_bins * full - (n_bins - 1) * mean_leave_one_out
+    error = np.sqrt((n_bins - 1) / n_bins
+                    * ((leave_one_out - mean_leave_one_out) ** 2).sum(axis=0))
+    return value, error
+
+# ==============================================================================
+# THERMODYNAMIC OBSERVABLES
+# ==============================================================================
+
+def _moment(averages, name):
+    return averages[..., MOMENTS.index(name)]
+
+def derived_observables(bins, T, N):
+    """
+    Energy, magnetization, specific heat, susceptibility and Binder cumulant.
+
+    Parameters:
+        bins: (..., n_bins, 5) bin averages from MomentAccumulator.bins,
+            stacked over temperatures along the leading axes
+        T: temperatures, broadcastable to the leading axes of bins
+        N: number of sites
+
+    Returns:
+        results: dict of name -> (value, error) with names "e", "m", "C_v",
+            "chi", "U_4"; every value and error has the shape of the leading axes
+    """
+    beta = 1.0 / np.asarray(T, dtype=np.float64)
+
+    def energy(a):
+        return _moment(a, "E") / N
+
+    def magnetization(a):
+        return _moment(a, "absM") / N
+
+    def specific_heat(a):
+        return beta**2 * (_moment(a, "E2") - _moment(a, "E") ** 2) / N
+
+    def susceptibility(a):
+        return beta * (_moment(a, "M2") - _moment(a, "absM") ** 2) / N
+
+    def binder(a):
+        return 1.0 - _moment(a, "M4") / (3.0 * _moment(a, "M2") ** 2)
+
+    estimators = {"e": energy, "m": magnetization, "C_v": specific_heat,
+                  "chi": susceptibility, "U_4": binder}
+    return {name: jackknife(bins, estimator) for name, estimator in estimators.items()}
@@ -0,0 +1,408 @@
+"""
+Compiled Metropolis and measurement kernels (Numba), with a NumPy fallback.
+
+The Numba notebook compiles its functions on the first call of every new
+kernel or process (and runs a throwaway step to force it). Here the kernels
+are compiled for explicit type signatures with cache=True: the machine code
+is written to __pycache__ once, and every later import (notebook restart,
+sweep worker process) only loads it from disk.
+
+Backends, tried in this order when the module is imported (BACKEND):
+- "aot":   the extension module _ising_kernels built ahead of time with
+           `python kernels.py --aot` (no compilation at all, not even a cache
+           lookup; uses the pending-deprecation numba.pycc)
+- "numba": JIT with the on-disk cache
+- "numpy": Numba is not installed; the drop-in functions below call the
+           vectorized NumPy engines of ising.py instead
+
+The drop-in functions sweep_checkerboard, sweep_random and
+measure_observables take the same arguments as those in ising.py. They
+draw the random numbers of a whole MCS with the same Generator calls, so
+they give exactly the same trajectories as the NumPy engines.
+
+sweep_parallel is the multithreaded checkerboard sweep (Numba JIT only,
+compiled on first use); it draws its own counter-based random numbers.
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from random_streams import generator_of, random_bits32, random_sites
+
+# ==============================================================================
+# KERNELS (plain Python, compiled below)
+# ==============================================================================
+
+def _metropolis(spins, nbr, acceptance, sites, draws):
+    """
+    Attempt flips of sites[k] with random number draws[k], in order.
+
+    Sites of one sublattice are independent, so passing the sublattices one
+    after the other is the checkerboard sweep; random sites give the random
+    updating of step_once.
+
+    Returns:
+        delta_E, delta_M: total changes from the accepted flips
+    """
+    z = nbr.shape[1]
+    offset = 2 * z
+    delta_E_total = 0
+    delta_M_total = 0
+    for k in range(sites.shape[0]):
+        i = sites[k]
+        spin_i = np.int64(spins[i])
+        neighbor_sum = 0
+        for j in range(z):
+            neighbor_sum += spins[nbr[i, j]]
+        delta_E = 2 * spin_i * neighbor_sum
+        if draws[k] < acceptance[delta_E + offset]:
+            spins[i] = -spin_i
+            delta_E_total += delta_E
+            delta_M_total -= 2 * spin_i
+    return delta_E_total, delta_M_total
+
+def _measure(spins, nbr):
+    """Total energy and magnetization, as integers."""
+    N, z = nbr.shape
+    E = 0
+    M = 0
+    for i in range(N):
+        spin_i = np.int64(spins[i])
+        M += spin_i
+        neighbor_sum = 0
+        for j in range(z):
+            neighbor_sum += spins[nbr[i, j]]
+        E -= spin_i * neighbor_sum
+    return E // 2, M
+
+# ==============================================================================
+# SIGNATURES AND COMPILATION
+# ==============================================================================
+
+INDEX_TYPES = ("int16", "int32", "int64")                           # see geometry.index_dtype
+ACCEPTANCE_TYPES = (("float64", "float64"), ("int64", "uint32"))    # (acceptance, draws)
+
+def _signatures():
+    """Kernel name -> (function, signature string) for every exported variant."""
+    signatures = {}
+    for index in INDEX_TYPES:
+        for acceptance, draws in ACCEPTANCE_TYPES:
+            signatures[f"metropolis_{index}_{acceptance}"] = (
+                _metropolis,
+                f"UniTuple(int64, 2)(int8[::1], {index}[:, ::1], {acceptance}[::1], "
+                f"int64[::1], {draws}[::1])")
+        signatures[f"measure_{index}"] = (_measure, f"UniTuple(int64, 2)(int8[::1], {index}[:, ::1])")
+    return signatures
+
+def _load_kernels():
+    """Pick the backend and return (BACKEND, dict of kernel name -> callable)."""
+    try:
+        import _ising_kernels
+        return "aot", {name: getattr(_ising_kernels, name) for name in _signatures()}
+    except ImportError:
+        pass
+    try:
+        import numba
+    except ImportError:
+        return "numpy", {}
+
+    # One dispatcher per Python function, compiled for all its signatures
+    # at import (or loaded from the cache)
+    dispatchers = {}
+    kernels = {}
+    for name, (function, signature) in _signatures().items():
+        if function not in dispatchers:
+            signature_list = [s for f, s in _signatures().values() if f is function]
+            dispatchers[function] = numba.njit(signature_list, cache=True, nogil=True)(function)
+        kernels[name] = dispatchers[function]
+    return "numba", kernels
+
+BACKEND, KERNELS = _load_kernels()
+
+def build_aot(output_dir=None):
+    """
+    Compile all kernels ahead of time into the extension module _ising_kernels.
+
+    Parameters:
+        output_dir: directory of the module (default: next to this file,
+            where the import above finds it)
+    """
+    from numba.pycc import CC
+
+    cc = CC("_ising_kernels")
+    cc.output_dir = output_dir or os.path.dirname(os.path.abspath(__file__))
+    for name, (function, signature) in _signatures().items():
+        cc.export(name, signature)(function)
+    cc.compile()
+
+# ==============================================================================
+# DROP-IN ENGINES (same arguments as in ising.py)
+# ==============================================================================
+
+def _metropolis_kernel(nbr, acceptance):
+    return KERNELS[f"metropolis_{nbr.dtype.name}_{acceptance.dtype.name}"]
+
+def sweep_checkerboard(spins, nbr, acceptance, sublattices, rng):
+    """
+    Compiled version of ising.sweep_checkerboard (same results).
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        acceptance: table from precompute_acceptance, or integer thresholds
+            from random_streams.precompute_thresholds
+        sublattices: list of site index arrays from checkerboard_sublattices,
+            or their concatenation as one array
+        rng: numpy.random.Generator or random_streams.RandomBlocks
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change of the accepted flips
+        delta_M: total magnetization change of the accepted flips
+    """
+    if BACKEND == "numpy":
+        from ising import sweep_checkerboard as sweep_numpy
+        if isinstance(sublattices, np.ndarray):
+            raise ValueError("The NumPy fallback needs the list of sublattices")
+        return sweep_numpy(spins, nbr, acceptance, sublattices, rng)
+
+    order = sublattices if isinstance(sublattices, np.ndarray) else np.concatenate(sublattices)
+    # One draw per site in sublattice order, as the NumPy engine draws them
+    if acceptance.dtype.kind == "i":
+        draws = random_bits32(rng, order.size)
+    else:
+        draws = rng.random(order.size)
+    delta_E, delta_M = _metropolis_kernel(nbr, acceptance)(spins, nbr, acceptance, order, draws)
+    return spins, delta_E, delta_M
+
+def sweep_random(spins, nbr, acceptance, rng):
+    """
+    Compiled version of ising.sweep_random (same results).
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins (modified in-place)
+        nbr: (N, z) neighbor array
+        acceptance: table from precompute_acceptance, or integer thresholds
+        rng: numpy.random.Generator or random_streams.RandomBlocks
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change of the accepted flips
+        delta_M: total magnetization change of the accepted flips
+    """
+    if BACKEND == "numpy":
+        from ising import sweep_random as sweep_numpy
+        return sweep_numpy(spins, nbr, acceptance, rng)
+
+    N = nbr.shape[0]
+    sites = np.ascontiguousarray(random_sites(rng, N, N), dtype=np.int64)
+    if acceptance.dtype.kind == "i":
+        draws = random_bits32(rng, N)
+    else:
+        draws = rng.random(N)
+    delta_E, delta_M = _metropolis_kernel(nbr, acceptance)(spins, nbr, acceptance, sites, draws)
+    return spins, delta_E, delta_M
+
+def measure_observables(spins, nbr):
+    """
+    Compiled version of ising.measure_observables.
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins
+        nbr: (N, z) neighbor array
+
+    Returns:
+        E: total energy (each pair counted once)
+        M: total magnetization
+    """
+    if BACKEND == "numpy":
+        from ising import measure_observables as measure_numpy
+        return measure_numpy(spins, nbr)
+    return KERNELS[f"measure_{nbr.dtype.name}"](spins, nbr)
+
+# ==============================================================================
+# MULTITHREADED CHECKERBOARD SWEEP
+# ==============================================================================
+"""
+sweep_parallel splits every sublattice into chunks of CHUNK sites and
+updates the chunks in parallel threads (numba.prange; set the number of
+threads with numba.set_num_threads or NUMBA_NUM_THREADS). For the square
+lattice a chunk is a few consecutive rows, so the neighbor lookups stay in
+cache; the 4z + 1 integer thresholds of random_streams.precompute_thresholds
+fit in one cache line or two. E and M changes are summed by the parallel
+reduction itself, without a second pass.
+
+The threads run on Numba's "workqueue" threading layer (THREADING_LAYER)
+unless NUMBA_THREADING_LAYER says otherwise. The default layer is TBB when
+it is installed, and TBB is not fork-safe: after a parallel sweep, the
+forked workers of domain.py, tempering.py or sweep.py left the interpreter
+hanging at exit.
+
+The random numbers come from a counter-based generator (splitmix64): the
+uint32 for the k-th site of sublattice s is a hash of (key, s, k), where
+key is one 64-bit draw from the run's Generator per sweep. Every chunk
+jumps straight to its position in the stream, so the results depend only on
+the seed, not on the number of threads or on how the chunks are scheduled,
+and the NumPy fallback reproduces them exactly.
+"""
+
+CHUNK = 4096
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+SHIFT_30, SHIFT_27, SHIFT_31, SHIFT_32 = (np.uint64(n) for n in (30, 27, 31, 32))
+THREADING_LAYER = "workqueue"   # fork-safe; used unless NUMBA_THREADING_LAYER is set
+
+try:
+    from numba import prange
+except ImportError:
+    prange = range
+
+def _checkerboard_parallel(spins, nbr, thresholds, sites, bounds, bases, chunk):
+    """
+    Sweep the sublattices sites[bounds[s]:bounds[s+1]] one after the other,
+    with the chunks of each sublattice in parallel.
+
+    Returns:
+        delta_E, delta_M: total changes from the accepted flips
+    """
+    z = nbr.shape[1]
+    offset = 2 * z
+    delta_E_total = 0
+    delta_M_total = 0
+    for s in range(bounds.shape[0] - 1):
+        first = bounds[s]
+        n = bounds[s + 1] - first
+        n_chunks = (n + chunk - 1) // chunk
+        for c in prange(n_chunks):
+            start = c * chunk
+            end = min(n, start + chunk)
+            state = bases[s] + np.uint64(start) * GOLDEN
+            for k in range(start, end):
+                # splitmix64: state of site k is bases[s] + (k + 1) * GOLDEN
+                state += GOLDEN
+                x = (state ^ (state >> SHIFT_30)) * MIX_1
+                x = (x ^ (x >> SHIFT_27)) * MIX_2
+                x = x ^ (x >> SHIFT_31)
+                bits = np.int64(x >> SHIFT_32)
+
+                i = sites[first + k]
+                spin_i = np.int64(spins[i])
+                neighbor_sum = 0
+                for j in range(z):
+                    neighbor_sum += spins[nbr[i, j]]
+                delta_E = 2 * spin_i * neighbor_sum
+                if bits < thresholds[delta_E + offset]:
+                    spins[i] = -spin_i
+                    delta_E_total += delta_E
+                    delta_M_total -= 2 * spin_i
+    return delta_E_total, delta_M_total
+
+def _mix64(x):
+    """splitmix64 finalizer of a uint64 array."""
+    x = (x ^ (x >> SHIFT_30)) * MIX_1
+    x = (x ^ (x >> SHIFT_27)) * MIX_2
+    return x ^ (x >> SHIFT_31)
+
+def _splitmix_bits(base, n):
+    """NumPy version of the stream of _checkerboard_parallel: n uint32 values as int64."""
+    x = _mix64(base + np.arange(1, n + 1, dtype=np.uint64) * GOLDEN)
+    return (x >> SHIFT_32).astype(np.int64)
+
+_parallel_dispatcher = None
+
+def _parallel_kernel():
+    """The compiled parallel kernel (compiled or loaded from the cache on first use), or None."""
+    global _parallel_dispatcher
+    if _parallel_dispatcher is None:
+        try:
+            import numba
+        except ImportError:
+            return None
+        if "NUMBA_THREADING_LAYER" not in os.environ:
+            # Chosen at the first parallel launch, so set before compiling
+            numba.config.THREADING_LAYER = THREADING_LAYER
+        signatures = [f"UniTuple(int64, 2)(int8[::1], {index}[:, ::1], int64[::1], int64[::1], "
+                      f"int64[::1], uint64[::1], int64)" for index in INDEX_TYPES]
+        _parallel_dispatcher = numba.njit(signatures, parallel=True, cache=True)(_checkerboard_parallel)
+    return _parallel_dispatcher
+
+def parallel_sublattices(sublattices):
+    """
+    Concatenate the sublattices once for sweep_parallel.
+
+    Parameters:
+        sublattices: list of site index arrays from checkerboard_sublattices
+
+    Returns:
+        (sites, bounds): int64 arrays, sublattice s is sites[bounds[s]:bounds[s+1]]
+    """
+    sites = np.concatenate(sublattices).astype(np.int64)
+    bounds = np.cumsum([0] + [len(sites_s) for sites_s in sublattices]).astype(np.int64)
+    return sites, bounds
+
+def sweep_parallel(spins, nbr, thresholds, sublattices, rng, chunk=CHUNK):
+    """
+    Multithreaded checkerboard sweep with counter-based random numbers.
+
+    Parameters:
+        spins: (N,) int8 array of ±1 spins (modified in-place)
+        nbr: (N, z) C-contiguous neighbor array
+        thresholds: integer thresholds from random_streams.precompute_thresholds
+        sublattices: list of site index arrays from checkerboard_sublattices,
+            or the (sites, bounds) pair from parallel_sublattices
+        rng: numpy.random.Generator or random_streams.RandomBlocks (one
+            64-bit key is drawn per sweep)
+        chunk: number of sites per parallel work item
+
+    Returns:
+        spins: Updated spin configuration
+        delta_E: total energy change of the accepted flips
+        delta_M: total magnetization change of the accepted flips
+    """
+    sites, bounds = sublattices if isinstance(sublattices, tuple) else parallel_sublattices(sublattices)
+    key = generator_of(rng).integers(0, 2**64, dtype=np.uint64, size=1)
+    # One stream per sublattice: the key hashed with the sublattice number
+    bases = _mix64(key ^ np.arange(1, len(bounds), dtype=np.uint64) * MIX_1)
+
+    kernel = _parallel_kernel()
+    if kernel is not None:
+        delta_E, delta_M = kernel(spins, nbr, thresholds, sites, bounds, bases, chunk)
+        return spins, delta_E, delta_M
+
+    # NumPy fallback with the same random numbers
+    offset = 2 * nbr.shape[1]
+    total_delta_E = 0
+    total_delta_M = 0
+    for s, base in enumerate(bases):
+        sites_s = sites[bounds[s]:bounds[s + 1]]
+        spin_i = spins[sites_s]
+        delta_E = 2 * spin_i * spins[nbr[sites_s]].sum(axis=1, dtype=np.int64)
+        flip = _splitmix_bits(base, sites_s.size) < thresholds[delta_E + offset]
+        spins[sites_s[flip]] *= -1
+        total_delta_E += int(delta_E[flip].sum())
+        total_delta_M -= 2 * int(spin_i[flip].sum(dtype=np.int64))
+    return spins, total_delta_E, total_delta_M
+
+# ==============================================================================
+# COMMAND LINE INTERFACE
+# ==============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the Ising kernels.")
+    parser.add_argument("--aot", action="store_true",
+                        help="build the ahead-of-time extension module _ising_kernels")
+    parser.add_argument("--output-dir", default=None, help="directory of the extension module")
+    args = parser.parse_args(argv)
+
+    if args.aot:
+        build_aot(args.output_dir)
+        print("Built _ising_kernels; it is used from the next import on")
+    else:
+        # Importing this module already compiled (or loaded) the kernels
+        print(f"Kernels ready (backend: {BACKEND})")
+
+if __name__ == "__main__":
+    main()
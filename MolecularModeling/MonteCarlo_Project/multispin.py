@@ -0,0 +1,227 @@
+"""
+Multi-spin coding: 64 independent replicas of the lattice in one uint64 array.
+
+Bit r of words[i] is the spin of site i in replica r (1 = up, 0 = down), so
+one (N,) uint64 array holds 64 lattices in the memory of 8 int8 ones. The
+Metropolis update works on whole words with bitwise logic: the number of
+anti-aligned neighbors is counted with a bit-sliced adder, and the acceptance
+is decided for all 64 replicas at once with random bit masks.
+
+The update is a checkerboard sweep (see ising.sweep_checkerboard) and only
+uses the neighbor array, so it works on any lattice whose sublattices can be
+computed with ising.checkerboard_sublattices.
+"""
+
+import numpy as np
+
+from ising import checkerboard_sublattices
+
+N_REPLICAS = 64
+ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+# ==============================================================================
+# RANDOM WORDS
+# ==============================================================================
+
+def random_words(rng, size):
+    """
+    Draw uniformly random uint64 words (each bit is 0 or 1 with probability 1/2).
+
+    Parameters:
+        rng: numpy.random.Generator
+        size: number of words
+
+    Returns:
+        words: (size,) uint64 array
+    """
+    return rng.integers(0, ALL_ONES, size=size, dtype=np.uint64, endpoint=True)
+
+def bernoulli_words(p, size, rng, precision=32):
+    """
+    Draw uint64 words whose bits are independently 1 with probability p.
+
+    p is rounded to q / 2**precision. Reading the bits of q from the least
+    significant one, w = w | r for a 1 bit and w = w & r for a 0 bit, with r
+    a fresh uniformly random word, gives P(bit = 1) = q / 2**precision.
+
+    Parameters:
+        p: probability of a 1 bit
+        size: number of words
+        rng: numpy.random.Generator
+        precision: number of random words used per output word
+
+    Returns:
+        words: (size,) uint64 array
+    """
+    q = int(round(p * 2**precision))
+    if q >= 2**precision:
+        return np.full(size, ALL_ONES)
+
+    words = np.zeros(size, dtype=np.uint64)
+    if q == 0:
+        return words
+    # Trailing 0 bits would only AND into an all-zero word
+    bit = (q & -q).bit_length() - 1
+    while bit < precision:
+        if (q >> bit) & 1:
+            words |= random_words(rng, size)
+        else:
+            words &= random_words(rng, size)
+        bit += 1
+    return words
+
+# ==============================================================================
+# INITIALIZATION AND MEASUREMENT
+# ==============================================================================
+
+def random_configuration(N, rng):
+    """
+    Random initial configuration for all 64 replicas.
+
+    Parameters:
+        N: number of sites
+        rng: numpy.random.Generator
+
+    Returns:
+        words: (N,) uint64 array
+    """
+    return random_words(rng, N)
+
+def column_popcount(words):
+    """
+    Count, for each bit position r, how many words have bit r set.
+
+    This is the popcount of each replica: the words are unpacked to bits
+    and summed over sites in one pass.
+
+    Parameters:
+        words: (n,) or (n, k) uint64 array
+
+    Returns:
+        counts: (64,) int64 array, counts[r] for replica r
+    """
+    words = np.ascontiguousarray(words, dtype='<u8').reshape(-1)
+    bits = np.unpackbits(words.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    return bits.sum(axis=0, dtype=np.int64)
+
+def measure_multispin(words, nbr):
+    """
+    Calculate M and E of all 64 replicas.
+
+    Same conventions as measure_observables: E = -Σ_{<i,j>} S_i S_j as a
+    float and M = Σ_i S_i as an integer, one value per replica.
+
+    Parameters:
+        words: (N,) uint64 array of packed spins
+        nbr: (N, z) neighbor array
+
+    Returns:
+        E: (64,) float64 array of energies
+        M: (64,) int64 array of magnetizations
+    """
+    N, z = nbr.shape
+    M = 2 * column_popcount(words) - N
+
+    # Each bond appears twice in nbr; a bond contributes -1 if aligned, +1 if not
+    anti_aligned = column_popcount(words[:, None] ^ words[nbr]) // 2
+    E = (2 * anti_aligned - N * z // 2).astype(np.float64)
+    return E, M
+
+# ==============================================================================
+# MONTE CARLO UPDATE (bitwise Metropolis sweep)
+# ==============================================================================
+
+def sweep_multispin(words, nbr, beta, sublattices, rng, precision=32):
+    """
+    Perform one Monte Carlo Step (N attempted flips) in each of the 64 replicas.
+
+    With n anti-aligned neighbors out of z, ΔE = 2 (z - 2n). Flips with
+    n >= z/2 (ΔE <= 0) are always accepted. A flip with n < z/2 is accepted
+    with probability exp(-β ΔE) = x**(z/2 - n), x = exp(-4β), i.e. when
+    z/2 - n independent Bernoulli(x) bits are all 1.
+
+    Parameters:
+        words: (N,) uint64 array of packed spins (modified in-place)
+        nbr: (N, z) neighbor array
+        beta: 1/T (inverse temperature)
+        sublattices: list of site index arrays from checkerboard_sublattices
+        rng: numpy.random.Generator
+        precision: random words per Bernoulli word (see bernoulli_words)
+
+    Returns:
+        words: Updated packed spins
+    """
+    z = nbr.shape[1]
+    n_planes = z.bit_length()
+    n_uphill = (z + 1) // 2        # n = 0, 1, ... with ΔE > 0
+    x = np.exp(-4.0 * beta)
+
+    for sites in sublattices:
+        center = words[sites]
+        size = sites.size
+
+        # Bit-sliced count of anti-aligned neighbors (ripple-carry adder)
+        planes = [np.zeros(size, dtype=np.uint64) for _ in range(n_planes)]
+        for k in range(z):
+            carry = center ^ words[nbr[sites, k]]
+            for b in range(n_planes):
+                planes[b], carry = planes[b] ^ carry, planes[b] & carry
+
+        # Walk down from n = z/2 - 1 to n = 0, AND-ing one more Bernoulli(x)
+        # word each time, so that n accepts with probability x**(z/2 - n)
+        # (for odd z the first factor is exp(-2β) instead of x)
+        uphill = np.zeros(size, dtype=np.uint64)
+        accept_uphill = np.zeros(size, dtype=np.uint64)
+        factor = np.full(size, ALL_ONES)
+        for n in range(n_uphill - 1, -1, -1):
+            p = np.exp(-2.0 * beta) if (z % 2 == 1 and n == n_uphill - 1) else x
+            factor &= bernoulli_words(p, size, rng, precision)
+            equal = np.full(size, ALL_ONES)
+            for b in range(n_planes):
+                equal &= planes[b] if (n >> b) & 1 else ~planes[b]
+            uphill |= equal
+            accept_uphill |= equal & factor
+
+        words[sites] = center ^ (~uphill | accept_uphill)
+    return words
+
+# ==============================================================================
+# FULL SIMULATION WITH MEASUREMENTS
+# ==============================================================================
+
+def run_multispin(nbr, T, n_MCS, n_meas, seed=None, precision=32):
+    """
+    Run 64 independent replicas and return their time series.
+
+    Measurements are taken every n_meas MCS as in inspiration.py, and have
+    the measure_observables conventions (E float64, M int64).
+
+    Parameters:
+        nbr: (N, z) neighbor array
+        T: temperature
+        n_MCS: total number of Monte Carlo steps
+        n_meas: number of MCS between two measurements
+        seed: random number generator seed
+        precision: random words per Bernoulli word (see bernoulli_words)
+
+    Returns:
+        words: final packed spins
+        energies: (64, n_MCS // n_meas) float64 array
+        magnetizations: (64, n_MCS // n_meas) int64 array
+    """
+    rng = np.random.default_rng(seed)
+    beta = 1.0 / T
+    sublattices = checkerboard_sublattices(nbr)
+    words = random_configuration(nbr.shape[0], rng)
+
+    n_measurements = n_MCS // n_meas
+    energies = np.zeros((N_REPLICAS, n_measurements), dtype=np.float64)
+    magnetizations = np.zeros((N_REPLICAS, n_measurements), dtype=np.int64)
+
+    for mcs_step in range(n_MCS):
+        sweep_multispin(words, nbr, beta, sublattices, rng, precision)
+        if (mcs_step + 1) % n_meas == 0:
+            idx = (mcs_step + 1) // n_meas - 1
+            energies[:, idx], magnetizations[:, idx] = measure_multispin(words, nbr)
+
+    return words, energies, magnetizations
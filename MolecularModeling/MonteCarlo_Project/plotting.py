@@ -0,0 +1,396 @@
+"""
+Figures of a sweep (Required_Tasks 6, 7 and 8) for long time series.
+
+inspiration.py hands the whole series to matplotlib: 10⁷ points per line
+take seconds to draw and hundreds of MB, and keeping only every 100th point
+hides the short excursions that Task 6 is about. Here a series is reduced to
+a few thousand buckets before plotting, reading it in chunks of CHUNK
+samples, so memory-mapped series (series_io.open_series,
+series_io.read_text_series) are never loaded as a whole:
+
+- minmax_envelope: min, max and mean of every bucket; the envelope keeps
+  every spike, however short
+- lttb: largest-triangle-three-buckets, one actual sample per bucket, chosen
+  to keep the visual shape of the line
+
+plot_sweep draws all figures of a sweep in one batch: one Task 6 figure per
+job, one Task 7 figure per lattice size and one Task 8 figure. Each kind of
+figure is one matplotlib Figure object, cleared and redrawn for every file,
+on the non-interactive Agg canvas (no pyplot, no window, and the backend of
+a notebook importing this module is left alone).
+
+Command line example:
+    python plotting.py sweep_L100.npz --output-dir figures
+"""
+
+import argparse
+import os
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from sweep import derived_table, load_results
+
+CHUNK = 1 << 20          # samples read at once
+N_BUCKETS = 2000         # points per decimated line
+FIRST_MCS = 1000         # length of the short time series of Task 6
+
+# ==============================================================================
+# DECIMATION
+# ==============================================================================
+
+def _blocks(series, edges, chunk):
+    """
+    Read whole buckets of a series, about chunk samples at a time.
+
+    Parameters:
+        series: 1D array-like (array, memmap)
+        edges: (n_buckets + 1,) increasing sample indices, bucket b is
+            edges[b] .. edges[b+1]-1
+        chunk: number of samples per read
+
+    Yields:
+        first: index of the first bucket of the block
+        block: float64 array of the samples of the block
+        offsets: start of every bucket of the block, relative to the block
+    """
+    n_buckets = len(edges) - 1
+    first = 0
+    while first < n_buckets:
+        last = int(np.searchsorted(edges, edges[first] + chunk, side="right")) - 1
+        last = min(n_buckets, max(first + 1, last))
+        block = np.asarray(series[edges[first]:edges[last]], dtype=np.float64)
+        yield first, block, edges[first:last] - edges[first]
+        first = last
+
+def minmax_envelope(series, n_buckets=N_BUCKETS, stop=None, chunk=CHUNK):
+    """
+    Minimum, maximum and mean of the series in n_buckets equal buckets.
+
+    Parameters:
+        series: 1D array-like (array, memmap)
+        n_buckets: number of buckets (fewer if the series is shorter)
+        stop: only use series[:stop]
+        chunk: number of samples per read
+
+    Returns:
+        x: (n,) center of every bucket, in sample indices
+        lower, upper, mean: (n,) arrays
+    """
+    n = len(series) if stop is None else min(stop, len(series))
+    edges = np.unique(np.linspace(0, n, min(n_buckets, n) + 1).astype(np.int64))
+    lower = np.empty(len(edges) - 1)
+    upper = np.empty(len(edges) - 1)
+    total = np.empty(len(edges) - 1)
+    for first, block, offsets in _blocks(series, edges, chunk):
+        last = first + len(offsets)
+        lower[first:last] = np.minimum.reduceat(block, offsets)
+        upper[first:last] = np.maximum.reduceat(block, offsets)
+        total[first:last] = np.add.reduceat(block, offsets)
+    return (edges[:-1] + edges[1:] - 1) / 2.0, lower, upper, total / np.diff(edges)
+
+def lttb(series, n_out=N_BUCKETS, stop=None, chunk=CHUNK):
+    """
+    Largest-triangle-three-buckets downsampling (Steinarsson 2013).
+
+    The first and last samples are kept; the others are split into n_out - 2
+    buckets, and from each bucket the sample is kept that forms the largest
+    triangle with the sample kept from the previous bucket and the mean of
+    the next bucket.
+
+    Parameters:
+        series: 1D array-like (array, memmap)
+        n_out: number of points kept
+        stop: only use series[:stop]
+        chunk: number of samples per read
+
+    Returns:
+        x: (n_out,) sample indices of the kept points (all samples if
+            there are fewer than 2 n_out)
+        y: their values
+    """
+    n = len(series) if stop is None else min(stop, len(series))
+    if n < 2 * n_out or n_out < 3:
+        # Too few samples to decimate
+        return np.arange(n), np.asarray(series[:n], dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    # First pass: mean of every bucket
+    mean_y = np.empty(n_out - 2)
+    for first, block, offsets in _blocks(series, edges, chunk):
+        mean_y[first:first + len(offsets)] = np.add.reduceat(block, offsets)
+    mean_y /= np.diff(edges)
+    mean_x = (edges[:-1] + edges[1:] - 1) / 2.0
+    # The "next bucket" of the last bucket is the last sample
+    next_x = np.append(mean_x[1:], n - 1)
+    next_y = np.append(mean_y[1:], float(series[n - 1]))
+
+    # Second pass: the kept sample of a bucket depends on the previous one
+    x = np.empty(n_out, dtype=np.int64)
+    y = np.empty(n_out)
+    x[0], y[0] = 0, float(series[0])
+    x[-1], y[-1] = n - 1, float(series[n - 1])
+    for first, block, offsets in _blocks(series, edges, chunk):
+        ends = np.append(offsets[1:], block.size)
+        for b, (start, end) in enumerate(zip(offsets, ends), start=first):
+            candidates_x = edges[b] + np.arange(end - start)
+            candidates_y = block[start:end]
+            area = np.abs((x[b] - next_x[b]) * (candidates_y - y[b])
+                          - (x[b] - candidates_x) * (next_y[b] - y[b]))
+            k = int(np.argmax(area))
+            x[b + 1], y[b + 1] = candidates_x[k], candidates_y[k]
+    return x, y
+
+# ==============================================================================
+# PANELS
+# ==============================================================================
+
+def plot_series(ax, series, n_meas, N, stop=None, method="envelope", n_buckets=N_BUCKETS,
+                chunk=CHUNK, label=None, color=None):
+    """
+    Draw a time series per site against MCS, decimated if it is long.
+
+    Parameters:
+        ax: matplotlib Axes
+        series: 1D array-like of E or M (measured every n_meas MCS)
+        n_meas: number of MCS between two measurements
+        N: number of sites
+        stop: only draw series[:stop]
+        method: "envelope" (min/max band and bucket means) or "lttb"
+        n_buckets: number of points of the decimated line; series with
+            fewer samples are drawn point by point
+        chunk: number of samples per read
+        label, color: passed to matplotlib
+    """
+    n = len(series) if stop is None else min(stop, len(series))
+    if n <= n_buckets:
+        y = np.asarray(series[:n], dtype=np.float64) / N
+        ax.plot((np.arange(n) + 1) * n_meas, y, lw=0.8, label=label, color=color)
+    elif method == "envelope":
+        x, lower, upper, mean = minmax_envelope(series, n_buckets, n, chunk)
+        mcs = (x + 1) * n_meas
+        lines = ax.plot(mcs, mean / N, lw=0.8, label=label, color=color)
+        ax.fill_between(mcs, lower / N, upper / N, color=lines[0].get_color(), alpha=0.3, lw=0)
+    elif method == "lttb":
+        x, y = lttb(series, n_buckets, n, chunk)
+        ax.plot((x + 1) * n_meas, y / N, lw=0.8, label=label, color=color)
+    else:
+        raise ValueError(f"Unknown decimation method: {method}")
+
+def draw_time_series(fig, energies, magnetizations, N, n_meas, title="", first_mcs=FIRST_MCS,
+                     **kwargs):
+    """
+    Task 6 figure: E/N and M/N for the first first_mcs MCS and the whole run.
+
+    Parameters:
+        fig: matplotlib Figure (cleared first)
+        energies, magnetizations: 1D array-likes of E and M
+        N: number of sites
+        n_meas: number of MCS between two measurements
+        title: figure title
+        first_mcs: length of the short series
+        kwargs: passed to plot_series for the whole run (method, n_buckets, chunk)
+    """
+    fig.clear()
+    axes = fig.subplots(2, 2, sharex="col")
+    for row, (series, name) in enumerate(((energies, "E / N"), (magnetizations, "M / N"))):
+        plot_series(axes[row, 0], series, n_meas, N, stop=max(1, first_mcs // n_meas),
+                    n_buckets=first_mcs)
+        plot_series(axes[row, 1], series, n_meas, N, **kwargs)
+        for ax in axes[row]:
+            ax.set_ylabel(name)
+            ax.grid(alpha=0.3)
+    axes[0, 0].set_title(f"First {first_mcs} MCS")
+    axes[0, 1].set_title(f"Whole run ({len(energies) * n_meas} MCS)")
+    for ax in axes[1]:
+        ax.set_xlabel("MCS")
+    fig.suptitle(title)
+
+def draw_binning(fig, results, L):
+    """
+    Task 7 figure: error of <E>/N and <|M|>/N against the bin size m, one
+    curve per temperature, with the error from τ_int as a dashed line.
+
+    Parameters:
+        fig: matplotlib Figure (cleared first)
+        results: list of result dicts from sweep.run_sweep / load_results
+        L: lattice size to draw
+    """
+    fig.clear()
+    axes = fig.subplots(1, 2)
+    jobs = sorted((r for r in results if r["L"] == L), key=lambda r: r["T"])
+    colors = _colors(len(jobs))
+    for r, color in zip(jobs, colors):
+        for ax, errors, tau_error in ((axes[0], r["E_bin_errors"], r["E_error_tau"]),
+                                      (axes[1], r["M_bin_errors"], r["M_error_tau"])):
+            ax.plot(r["bin_sizes"], errors, "o-", ms=3, color=color, label=f"T = {r['T']:.3f}")
+            ax.axhline(tau_error, color=color, ls="--", lw=0.8)
+    for ax, name in zip(axes, ("<E> / N", "<|M|> / N")):
+        ax.set_xscale("log", base=2)
+        ax.set_yscale("log")
+        ax.set_xlabel("bin size m")
+        ax.set_ylabel(f"error of {name}")
+        ax.grid(alpha=0.3, which="both")
+    axes[1].legend(fontsize="small")
+    fig.suptitle(f"Binning analysis, L = {L} (dashed: error from τ_int)")
+
+def draw_observables(fig, results, curves=None):
+    """
+    Task 8 figure: e, |m|, C_v, χ, U_4 and τ_E against T, one set of points
+    with error bars per lattice size, and the WHAM curves if given. The
+    error bars of <E>/N and <|M|>/N are those from τ_int (E_error_tau,
+    M_error_tau), which do not depend on the choice of a bin size.
+
+    Parameters:
+        fig: matplotlib Figure (cleared first)
+        results: list of result dicts from sweep.run_sweep / load_results
+        curves: optional dict L -> results of wham.wham (from wham_curves)
+    """
+    fig.clear()
+    axes = fig.subplots(2, 3, sharex=True).ravel()
+    table = derived_table(results)
+    T = table["T"]
+    sizes = np.unique(table["L"])
+    for L, color in zip(sizes, _colors(len(sizes))):
+        rows = np.flatnonzero(table["L"] == L)
+        rows = rows[np.argsort(T[rows])]
+        jobs = [results[k] for k in rows]
+        points = {
+            "e": ([r["E_mean"] for r in jobs], [r["E_error_tau"] for r in jobs]),
+            "m": ([r["M_mean"] for r in jobs], [r["M_error_tau"] for r in jobs]),
+            "C_v": (table["C_v"][rows], table["C_v_error"][rows]),
+            "chi": (table["chi"][rows], table["chi_error"][rows]),
+            "U_4": (table["U_4"][rows], table["U_4_error"][rows]),
+            "tau_E": ([r["tau_E"] for r in jobs], None),
+        }
+        for ax, (name, (value, error)) in zip(axes, points.items()):
+            ax.errorbar(T[rows], value, yerr=error, fmt="o", ms=3, capsize=2, color=color,
+                        label=f"L = {L}")
+            if curves is not None and L in curves and name in curves[L]:
+                ax.plot(curves[L]["T"], curves[L][name], lw=1.0, color=color)
+    labels = ("<E> / N", "<|M|> / N", "C_v", "χ", "U_4", "τ_E (MCS)")
+    for ax, label in zip(axes, labels):
+        ax.set_ylabel(label)
+        ax.grid(alpha=0.3)
+    for ax in axes[3:]:
+        ax.set_xlabel("T")
+    axes[0].legend(fontsize="small")
+    fig.suptitle("Observables per site (points: runs with τ_int errors, lines: multi-histogram)")
+
+def _colors(n):
+    """n colors of the viridis color map."""
+    from matplotlib import colormaps
+    return colormaps["viridis"](np.linspace(0.0, 0.9, max(n, 1)))
+
+# ==============================================================================
+# BATCH OF FIGURES FOR A SWEEP
+# ==============================================================================
+
+def wham_curves(results, n_points=101):
+    """
+    Multi-histogram curves of every lattice size with at least 2 temperatures.
+
+    The runs are weighted with their statistical inefficiency 2 τ_E / n_meas.
+
+    Parameters:
+        results: list of result dicts from sweep.run_sweep / load_results
+        n_points: number of temperatures of each curve
+
+    Returns:
+        curves: dict L -> results of wham.wham
+    """
+    from wham import histograms_from_series, wham
+
+    curves = {}
+    for L in sorted({r["L"] for r in results}):
+        jobs = sorted((r for r in results if r["L"] == L), key=lambda r: r["T"])
+        if len(jobs) < 2:
+            continue
+        skips = [r["n_discard"] // r["n_meas"] for r in jobs]
+        E, M, H = histograms_from_series([r["energies"][s:] for r, s in zip(jobs, skips)],
+                                         [r["magnetizations"][s:] for r, s in zip(jobs, skips)])
+        T_runs = np.array([r["T"] for r in jobs])
+        g = np.maximum(1.0, 2.0 * np.array([r["tau_E"] / r["n_meas"] for r in jobs]))
+        T_values = np.linspace(T_runs[0], T_runs[-1], n_points)
+        curves[L] = wham(E, H, T_runs, T_values, L**2, M=M, g=g)
+    return curves
+
+def plot_sweep(results, output_dir, method="envelope", n_buckets=N_BUCKETS, chunk=CHUNK,
+               curves=True, dpi=120, verbose=True):
+    """
+    Draw and save all figures of a sweep.
+
+    Files written in output_dir:
+        timeseries_L<L>_T<T>.png   Task 6, one per job
+        binning_L<L>.png           Task 7, one per lattice size
+        observables.png            Task 8
+
+    Parameters:
+        results: list of result dicts from sweep.run_sweep / load_results
+        output_dir: directory of the figures (created if needed)
+        method: decimation of the long time series, "envelope" or "lttb"
+        n_buckets: number of points of the decimated lines
+        chunk: number of samples per read
+        curves: add the multi-histogram curves to the Task 8 figure; True
+            computes them with wham_curves, or pass a dict from wham_curves
+        dpi: resolution of the PNG files
+        verbose: print the name of every file
+
+    Returns:
+        filenames: list of the files written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    filenames = []
+
+    def save(fig, name):
+        filename = os.path.join(output_dir, name)
+        fig.savefig(filename, dpi=dpi)
+        filenames.append(filename)
+        if verbose:
+            print(f"Figure saved as: {filename}")
+
+    # One figure object per kind, redrawn for every file
+    series_fig = Figure(figsize=(12, 7), layout="constrained")
+    FigureCanvasAgg(series_fig)
+    for r in sorted(results, key=lambda r: (r["L"], r["T"])):
+        draw_time_series(series_fig, r["energies"], r["magnetizations"], r["L"]**2, r["n_meas"],
+                         title=f"L = {r['L']}, T = {r['T']:.3f}", method=method,
+                         n_buckets=n_buckets, chunk=chunk)
+        save(series_fig, f"timeseries_L{r['L']}_T{r['T']:.3f}.png")
+
+    binning_fig = Figure(figsize=(12, 5), layout="constrained")
+    FigureCanvasAgg(binning_fig)
+    for L in sorted({r["L"] for r in results}):
+        draw_binning(binning_fig, results, L)
+        save(binning_fig, f"binning_L{L}.png")
+
+    if curves is True:
+        curves = wham_curves(results)
+    observables_fig = Figure(figsize=(14, 8), layout="constrained")
+    FigureCanvasAgg(observables_fig)
+    draw_observables(observables_fig, results, curves or None)
+    save(observables_fig, "observables.png")
+    return filenames
+
+# ==============================================================================
+# COMMAND LINE INTERFACE
+# ==============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draw the Task 6/7/8 figures of a sweep.")
+    parser.add_argument("results", help=".npz file from sweep.py")
+    parser.add_argument("--output-dir", default="figures")
+    parser.add_argument("--method", choices=("envelope", "lttb"), default="envelope",
+                        help="decimation of the long time series")
+    parser.add_argument("--buckets", type=int, default=N_BUCKETS, help="points per decimated line")
+    parser.add_argument("--no-wham", action="store_true", help="skip the multi-histogram curves")
+    parser.add_argument("--dpi", type=int, default=120)
+    args = parser.parse_args(argv)
+
+    results = load_results(args.results)
+    plot_sweep(results, args.output_dir, method=args.method, n_buckets=args.buckets,
+               curves=not args.no_wham, dpi=args.dpi)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Single-histogram (Ferrenberg-Swendsen) reweighting (Required_Tasks 8).
+
+A run at β0 = 1/T0 samples configurations with probability ∝ exp(-β0 E).
+Weighting every sample by exp(-(β - β0) E) gives averages at a nearby
+β = 1/T without a new run:
+
+    <O>_β = Σ_{E,M} H(E, M) O(E, M) exp(-(β - β0) E) / Σ_{E,M} H(E, M) exp(-(β - β0) E)
+
+E and M are bounded integers, so the joint histogram H(E, M) is collected
+during the run by HistogramAccumulator (pass it to run_simulation as
+histogram=...). It is kept per block of bin_length measurements (sparse:
+only the (E, M) pairs that occur), so the jackknife over blocks gives the
+errors of the reweighted e, m, C_v, χ and U_4 (see jackknife.py).
+
+Reweighting is only reliable while the reweighted energy distribution
+still overlaps the sampled one. The overlap Σ_E min(P_T0(E), P_T(E)) is
+returned for every T, and the reliability window is the range of T around
+T0 where it stays above min_overlap.
+"""
+
+import numpy as np
+
+from jackknife import jackknife
+
+# ==============================================================================
+# JOINT (E, M) HISTOGRAM
+# ==============================================================================
+
+class HistogramAccumulator:
+    """
+    Joint (E, M) histogram of the measurements, one per block of bin_length.
+
+    A pair (E, M) is stored as the integer code (E + E_max) (2N + 1) + (M + N).
+
+    Usage:
+        histogram = HistogramAccumulator(N, z, bin_length=1000, skip=100)
+        run_simulation(L, T, n_MCS, n_meas, histogram=histogram)
+        results = reweight(histogram, T, T_values)
+    """
+
+    def __init__(self, N, z, bin_length, skip=0):
+        """
+        Parameters:
+            N: number of sites
+            z: number of neighbors of each site
+            bin_length: number of measurements per block (jackknife bin)
+            skip: number of initial samples to ignore (equilibration)
+        """
+        self.N = N
+        self.z = z
+        self.bin_length = bin_length
+        self.skip = skip
+        self.n_seen = 0
+        self.E_max = N * z // 2
+        self.blocks = []      # (codes, counts) of every completed block
+        self.pending = []     # codes of the block being filled
+
+    def add(self, E, M):
+        """
+        Add one measurement.
+
+        Parameters:
+            E: energy
+            M: magnetization
+        """
+        self.n_seen += 1
+        if self.n_seen <= self.skip:
+            return
+        self.pending.append((int(E) + self.E_max) * (2 * self.N + 1) + int(M) + self.N)
+        if len(self.pending) == self.bin_length:
+            self.blocks.append(np.unique(np.array(self.pending, dtype=np.int64), return_counts=True))
+            self.pending = []
+
+    def histogram(self):
+        """
+        Histograms of the completed blocks over their common (E, M) pairs.
+
+        Returns:
+            E: (P,) int64 energies of the P distinct pairs
+            M: (P,) int64 magnetizations
+            counts: (n_blocks, P) int64 array of counts per block
+        """
+        if not self.blocks:
+            return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, 0), np.int64)
+        codes = np.concatenate([c for c, _ in self.blocks])
+        block = np.repeat(np.arange(len(self.blocks)), [c.size for c, _ in self.blocks])
+        pairs, index = np.unique(codes, return_inverse=True)
+        counts = np.zeros((len(self.blocks), pairs.size), dtype=np.int64)
+        np.add.at(counts, (block, index), np.concatenate([n for _, n in self.blocks]))
+        E = pairs // (2 * self.N + 1) - self.E_max
+        M = pairs % (2 * self.N + 1) - self.N
+        return E, M, counts
+
+    def get_state(self):
+        """
+        Internal state as a dict of arrays, e.g. for a checkpoint.
+
+        Returns:
+            state: dict of numpy arrays, accepted by set_state
+        """
+        return dict(N=np.array(self.N), z=np.array(self.z),
+                    bin_length=np.array(self.bin_length), skip=np.array(self.skip),
+                    n_seen=np.array(self.n_seen),
+                    block_sizes=np.array([c.size for c, _ in self.blocks], dtype=np.int64),
+                    codes=np.concatenate([c for c, _ in self.blocks] or [np.zeros(0, np.int64)]),
+                    counts=np.concatenate([n for _, n in self.blocks] or [np.zeros(0, np.int64)]),
+                    pending=np.array(self.pending, dtype=np.int64))
+
+    def set_state(self, state):
+        """
+        Restore the internal state saved with get_state.
+
+        Parameters:
+            state: dict of numpy arrays from get_state
+        """
+        self.N = int(state["N"])
+        self.z = int(state["z"])
+        self.bin_length = int(state["bin_length"])
+        self.skip = int(state["skip"])
+        self.n_seen = int(state["n_seen"])
+        self.E_max = self.N * self.z // 2
+        ends = np.cumsum(state["block_sizes"])
+        starts = ends - state["block_sizes"]
+        self.blocks = [(state["codes"][start:end], state["counts"][start:end])
+                       for start, end in zip(starts, ends)]
+        self.pending = state["pending"].tolist()
+
+# ==============================================================================
+# REWEIGHTING
+# ==============================================================================
+
+def reweight(histogram, T0, T_values, min_overlap=0.5):
+    """
+    Reweight the histogram of a run at T0 to the temperatures T_values.
+
+    Parameters:
+        histogram: HistogramAccumulator of the run (at least 2 blocks)
+        T0: temperature of the run
+        T_values: temperatures to reweight to
+        min_overlap: smallest energy-histogram overlap considered reliable
+
+    Returns:
+        results: dict with
+            "T": (n_T,) temperatures
+            "e", "m", "C_v", "chi", "U_4": (value, error) pairs of (n_T,)
+                arrays, jackknife errors over the blocks (per site, as in
+                jackknife.derived_observables)
+            "overlap": (n_T,) overlap of the reweighted and sampled P(E)
+            "reliable": (n_T,) overlap >= min_overlap
+            "window": (T_low, T_high), the reliable range around T0
+    """
+    N = histogram.N
+    E, M, counts = histogram.histogram()
+    T_values = np.asarray(T_values, dtype=np.float64)
+    beta = 1.0 / T_values
+
+    # Energies relative to the sampled mean, which keeps <E²> - <E>² accurate
+    E_ref = np.sum(counts.sum(axis=0) * E) / counts.sum()
+    dE = E - E_ref
+    exponent = -(beta - 1.0 / T0)[:, None] * dE[None, :]              # (n_T, P)
+    weights = np.exp(exponent - exponent.max(axis=1, keepdims=True))  # log-sum-exp shift
+
+    absM = np.abs(M).astype(np.float64)
+    M2 = absM**2
+    observables = np.stack([np.ones_like(absM), dE, dE**2, absM, M2, M2**2])  # (6, P)
+
+    # Weighted sums per block: bins[t, b, k] = Σ_p counts[b, p] w[t, p] O_k[p]
+    block_counts = counts.T.astype(np.float64)
+    bins = np.empty((len(T_values), counts.shape[0], len(observables)))
+    for k, values in enumerate(observables):
+        bins[:, :, k] = (weights * values) @ block_counts
+
+    def average(a, k):
+        return a[..., k] / a[..., 0]
+
+    estimators = {
+        "e": lambda a: (average(a, 1) + E_ref) / N,
+        "m": lambda a: average(a, 3) / N,
+        "C_v": lambda a: beta**2 * (average(a, 2) - average(a, 1) ** 2) / N,
+        "chi": lambda a: beta * (average(a, 4) - average(a, 3) ** 2) / N,
+        "U_4": lambda a: 1.0 - average(a, 5) / (3.0 * average(a, 4) ** 2),
+    }
+    results = {"T": T_values}
+    for name, estimator in estimators.items():
+        results[name] = jackknife(bins, estimator)
+
+    # Overlap of the energy histograms at T0 and at T
+    energies, index = np.unique(E, return_inverse=True)
+    sampled = np.bincount(index, weights=counts.sum(axis=0).astype(np.float64))
+    sampled /= sampled.sum()
+    log_weight = -(beta - 1.0 / T0)[:, None] * (energies - E_ref)[None, :]
+    reweighted = sampled * np.exp(log_weight - log_weight.max(axis=1, keepdims=True))
+    reweighted /= reweighted.sum(axis=1, keepdims=True)
+    overlap = np.minimum(sampled, reweighted).sum(axis=1)
+    reliable = overlap >= min_overlap
+    results.update(overlap=overlap, reliable=reliable, window=reliability_window(T_values, reliable, T0))
+    return results
+
+def reliability_window(T_values, reliable, T0):
+    """
+    Contiguous range of reliable temperatures around T0.
+
+    Parameters:
+        T_values: (n_T,) temperatures
+        reliable: (n_T,) bool array
+        T0: temperature of the run
+
+    Returns:
+        (T_low, T_high), or (nan, nan) if no temperature is reliable
+    """
+    order = np.argsort(T_values)
+    T_sorted, ok = T_values[order], reliable[order]
+    start = int(np.argmin(np.abs(T_sorted - T0)))
+    if not ok[start]:
+        return np.nan, np.nan
+    low = start
+    while low > 0 and ok[low - 1]:
+        low -= 1
+    high = start
+    while high < len(ok) - 1 and ok[high + 1]:
+        high += 1
+    return T_sorted[low], T_sorted[high]
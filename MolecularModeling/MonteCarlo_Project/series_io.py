@@ -0,0 +1,240 @@
+"""
+On-disk storage of the E and M time series.
+
+E and M are integers (|E| <= N z / 2, |M| <= N), so they are stored with the
+smallest integer dtype that holds them exactly (int16 up to L = 127 on the
+square lattice, where |E| <= 2 L², int32 above) instead of float64. This
+is deliberately smaller than a fixed int32 for all sizes. The series are written into memory-mapped
+.npy files while the simulation runs, so they survive the process and need
+no RAM; analysis and plotting code opens them zero-copy with open_series.
+
+A run with series_prefix="runs/L100_T2.27" writes
+    runs/L100_T2.27_E.npy
+    runs/L100_T2.27_M.npy
+
+Older time series in one- or two-column text files (e.g. bintest1.dat) are
+read with read_text_series: the text is parsed once, in large chunks, and a
+binary sidecar "<file>.npy" is written next to it together with a
+fingerprint "<file>.npy.json" (size and modification time of the text file).
+Later reads memory-map the sidecar, which takes milliseconds instead of the
+seconds to minutes of np.loadtxt.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+# ==============================================================================
+# DTYPES AND FILE NAMES
+# ==============================================================================
+
+def smallest_int_dtype(bound):
+    """
+    Smallest signed integer dtype that holds every value in [-bound, bound].
+
+    Parameters:
+        bound: largest absolute value
+
+    Returns:
+        dtype: numpy dtype
+    """
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        if bound <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"No integer dtype holds values up to {bound}")
+
+def series_dtypes(N, z):
+    """
+    Exact dtypes for E and M of a lattice with N sites and z neighbors.
+
+    Parameters:
+        N: number of sites
+        z: number of neighbors of each site
+
+    Returns:
+        E_dtype, M_dtype: numpy dtypes
+    """
+    return smallest_int_dtype(N * z // 2), smallest_int_dtype(N)
+
+def series_filenames(prefix):
+    """
+    File names of the E and M series of a run.
+
+    Parameters:
+        prefix: path prefix of the run
+
+    Returns:
+        E_file, M_file: file names
+    """
+    return f"{prefix}_E.npy", f"{prefix}_M.npy"
+
+# ==============================================================================
+# WRITING AND READING
+# ==============================================================================
+
+def create_series(prefix, length, N, z):
+    """
+    Create the memory-mapped E and M files of a run, filled with zeros.
+
+    Writes into the returned arrays go to the page cache; call flush() on
+    them to push a block of measurements to disk.
+
+    Parameters:
+        prefix: path prefix of the run
+        length: number of measurements
+        N: number of sites
+        z: number of neighbors of each site
+
+    Returns:
+        energies, magnetizations: writable numpy.memmap arrays
+    """
+    E_file, M_file = series_filenames(prefix)
+    E_dtype, M_dtype = series_dtypes(N, z)
+    energies = np.lib.format.open_memmap(E_file, mode="w+", dtype=E_dtype, shape=(length,))
+    magnetizations = np.lib.format.open_memmap(M_file, mode="w+", dtype=M_dtype, shape=(length,))
+    return energies, magnetizations
+
+def open_series(prefix, mode="r"):
+    """
+    Open the E and M series of a run without loading them into memory.
+
+    Parameters:
+        prefix: path prefix of the run
+        mode: "r" (read-only) or "r+" (e.g. to resume a run)
+
+    Returns:
+        energies, magnetizations: numpy.memmap arrays
+    """
+    E_file, M_file = series_filenames(prefix)
+    return np.load(E_file, mmap_mode=mode), np.load(M_file, mmap_mode=mode)
+
+# ==============================================================================
+# TEXT FILES WITH A BINARY SIDECAR
+# ==============================================================================
+
+TEXT_CHUNK = 1 << 24    # bytes of text parsed at once
+
+def _fingerprint(filename):
+    """Size and modification time of a file, to detect changes."""
+    status = os.stat(filename)
+    return {"size": status.st_size, "mtime_ns": status.st_mtime_ns}
+
+def sidecar_filenames(filename):
+    """
+    File names of the binary sidecar of a text file.
+
+    Parameters:
+        filename: text file
+
+    Returns:
+        data_file, fingerprint_file: file names
+    """
+    return f"{filename}.npy", f"{filename}.npy.json"
+
+_NONBLANK_LINE = re.compile(rb"^[^\S\n]*\S", re.MULTILINE)
+
+def _parse_chunk(text, n_columns, filename):
+    """
+    Numbers of a block of complete lines, skipping comments after '#'.
+
+    Every non-blank line must hold n_columns numbers; the lines are counted
+    with regular expressions over the whole block, not one by one.
+    """
+    if b"#" in text:
+        text = b"\n".join(line.split(b"#", 1)[0] for line in text.split(b"\n"))
+    n_lines = len(_NONBLANK_LINE.findall(text))
+    if n_lines == 0:
+        return np.zeros(0)     # np.fromstring would return [-1.0]
+    row = re.compile(rb"^[^\S\n]*(?:\S+[^\S\n]+){%d}\S+[^\S\n]*$" % (n_columns - 1), re.MULTILINE)
+    if len(row.findall(text)) != n_lines:
+        raise ValueError(f"{filename}: expected {n_columns} columns on every line")
+    try:
+        values = np.fromstring(text, dtype=np.float64, sep=" ")
+    except ValueError:
+        values = np.zeros(0)
+    if values.size != n_lines * n_columns:
+        raise ValueError(f"{filename}: non-numeric value")
+    return values
+
+def parse_text_series(filename, chunk_size=TEXT_CHUNK):
+    """
+    Parse a text file of one or two whitespace-separated columns.
+
+    The file is read in blocks of chunk_size bytes, cut at the last newline,
+    and each block is converted by numpy's C parser in one call, without a
+    Python loop over lines. Every line must have as many columns as the
+    first one, otherwise ValueError is raised (and no sidecar is written).
+
+    Parameters:
+        filename: text file
+        chunk_size: number of bytes read at once
+
+    Returns:
+        data: (n,) float64 array for one column, (n, 2) for two columns
+    """
+    blocks = []
+    n_columns = None
+    with open(filename, "rb") as f:
+        tail = b""
+        while True:
+            chunk = f.read(chunk_size)
+            text = tail + chunk
+            if chunk:
+                cut = text.rfind(b"\n") + 1
+                text, tail = text[:cut], text[cut:]
+            if n_columns is None:
+                for line in text.split(b"\n"):
+                    fields = line.split(b"#", 1)[0].split()
+                    if fields:
+                        n_columns = len(fields)
+                        break
+                if n_columns is not None and n_columns > 2:
+                    raise ValueError(f"{filename}: expected one or two columns")
+            if n_columns is not None:
+                blocks.append(_parse_chunk(text, n_columns, filename))
+            if not chunk:
+                break
+
+    if n_columns is None:
+        return np.zeros(0)
+    data = np.concatenate(blocks)
+    return data if n_columns == 1 else data.reshape(-1, 2)
+
+def read_text_series(filename, cache=True, chunk_size=TEXT_CHUNK):
+    """
+    Read a one- or two-column text time series, through a binary sidecar.
+
+    If the sidecar exists and its fingerprint matches the text file, it is
+    memory-mapped (read-only) and the text is not read at all. Otherwise
+    the text is parsed and, with cache=True, the sidecar is (re)written.
+
+    Parameters:
+        filename: text file
+        cache: write and use the sidecar
+        chunk_size: number of bytes parsed at once
+
+    Returns:
+        data: (n,) or (n, 2) float64 array (numpy.memmap when read from the sidecar)
+    """
+    data_file, fingerprint_file = sidecar_filenames(filename)
+    fingerprint = _fingerprint(filename)
+    if cache:
+        try:
+            with open(fingerprint_file) as f:
+                if json.load(f) == fingerprint:
+                    return np.load(data_file, mmap_mode="r")
+        except (OSError, ValueError):
+            pass
+
+    data = parse_text_series(filename, chunk_size)
+    if cache:
+        # Temporary names and rename, so a crash never leaves a valid
+        # fingerprint next to a truncated sidecar
+        np.save(f"{data_file}.tmp.npy", data)
+        os.replace(f"{data_file}.tmp.npy", data_file)
+        with open(f"{fingerprint_file}.tmp", "w") as f:
+            json.dump(fingerprint, f)
+        os.replace(f"{fingerprint_file}.tmp", fingerprint_file)
+    return data
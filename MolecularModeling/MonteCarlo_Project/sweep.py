@@ -0,0 +1,297 @@
+"""
+Parallel temperature / lattice-size sweeps (Required_Tasks 4 and 5).
+
+Runs ising.run_simulation for every (L, T, n_MCS, n_meas) of a grid on a
+process pool and collects the time series and binning results in one table.
+
+- Every job gets its own random number stream, spawned from one master seed
+  with numpy.random.SeedSequence, so a sweep is reproducible whatever the
+  number of workers or the order in which jobs finish.
+- Jobs are submitted longest-first, by estimated cost N * n_MCS, with an
+  extra weight near T_c where the runs are the most valuable to start early.
+
+The jobs also collect bin averages of E, E², |M|, M², M⁴ (MomentAccumulator)
+from which derived_table gives C_v, χ and the Binder cumulant with jackknife
+errors, for all temperatures of a lattice size at once.
+
+Command line example (Required_Tasks 5):
+    python sweep.py --L 100 --T-min 2.0 --T-max 3.0 --dT 0.1 --n-mcs 1000000 \\
+        --n-meas 10 --seed 42 --output sweep_L100.npz
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from autocorr import error_of_mean
+from binning import MomentAccumulator
+from instrumentation import Instrumentation, write_record
+from ising import binning_analysis, run_simulation
+from jackknife import derived_observables
+
+T_C = 2.0 / np.log(1.0 + np.sqrt(2.0))   # Onsager critical temperature
+JACKKNIFE_BINS = 100                      # number of moment bins per job
+
+# ==============================================================================
+# JOB GRID AND COST MODEL
+# ==============================================================================
+
+def make_grid(L_values, T_values, n_MCS, n_meas, n_discard=1000, engine="checkerboard"):
+    """
+    Build the list of jobs for every combination of L and T.
+
+    Parameters:
+        L_values: lattice sizes
+        T_values: temperatures
+        n_MCS: total number of MCS of each run
+        n_meas: number of MCS between two measurements
+        n_discard: number of MCS discarded for equilibration in the analysis
+        engine: update engine passed to run_simulation
+
+    Returns:
+        jobs: list of dicts with keys L, T, n_MCS, n_meas, n_discard, engine
+    """
+    return [dict(L=int(L), T=float(T), n_MCS=int(n_MCS), n_meas=int(n_meas),
+                 n_discard=int(n_discard), engine=engine)
+            for L in L_values for T in T_values]
+
+def estimate_cost(job, critical_weight=2.0, critical_width=0.15):
+    """
+    Estimated relative run time of a job.
+
+    The cost of the updates is N * n_MCS. Near T_c the same run also takes
+    longer to analyse and is more likely to be extended, so it is weighted by
+    1 + critical_weight * exp(-((T - T_c) / critical_width)**2).
+
+    Parameters:
+        job: dict from make_grid
+        critical_weight: extra weight at T = T_c
+        critical_width: width of the weighted region around T_c
+
+    Returns:
+        cost: float
+    """
+    N = job["L"] ** 2
+    critical = 1.0 + critical_weight * np.exp(-((job["T"] - T_C) / critical_width) ** 2)
+    return N * job["n_MCS"] * critical
+
+# ==============================================================================
+# RUNNING THE JOBS
+# ==============================================================================
+
+def run_job(job, seed_sequence, instrument=False):
+    """
+    Run one simulation and its binning analysis.
+
+    Parameters:
+        job: dict from make_grid
+        seed_sequence: numpy.random.SeedSequence of this job
+        instrument: also time the phases of the run and count the accepted
+            flips per ΔE (result["instrumentation"], see instrumentation.py)
+
+    Returns:
+        result: the job dict extended with the time series, the binning
+            results and the final estimates per site with their errors, both
+            from the binning plateau (E_error, M_error) and from the
+            integrated autocorrelation time (E_error_tau, M_error_tau; tau_E
+            and tau_M in MCS), and the (JACKKNIFE_BINS, 5) moment bins
+    """
+    skip = job["n_discard"] // job["n_meas"]
+    n_samples = job["n_MCS"] // job["n_meas"] - skip
+    moments = MomentAccumulator(max(1, n_samples // JACKKNIFE_BINS), skip=skip)
+    instrumentation = Instrumentation() if instrument else None
+
+    start_time = time.time()
+    _, energies, magnetizations = run_simulation(job["L"], job["T"], job["n_MCS"], job["n_meas"],
+                                                 seed=seed_sequence, engine=job["engine"],
+                                                 moments=moments, instrumentation=instrumentation)
+    elapsed = time.time() - start_time
+
+    N = job["L"] ** 2
+    bin_sizes, E_errors, E_means = binning_analysis(energies[skip:] / N)
+    _, M_errors, M_means = binning_analysis(np.abs(magnetizations[skip:]) / N)
+    _, E_error_tau, tau_E = error_of_mean(energies[skip:] / N)
+    _, M_error_tau, tau_M = error_of_mean(np.abs(magnetizations[skip:]) / N)
+
+    result = dict(job)
+    result.update(energies=energies, magnetizations=magnetizations,
+                  bin_sizes=bin_sizes, E_bin_errors=E_errors, M_bin_errors=M_errors,
+                  E_mean=E_means[0], E_error=E_errors[-1],
+                  M_mean=M_means[0], M_error=M_errors[-1],
+                  E_error_tau=E_error_tau, M_error_tau=M_error_tau,
+                  tau_E=tau_E * job["n_meas"], tau_M=tau_M * job["n_meas"],
+                  moment_bins=moments.bins[:JACKKNIFE_BINS],
+                  elapsed=elapsed, flip_rate=N * job["n_MCS"] / elapsed)
+    if instrument:
+        result["instrumentation"] = instrumentation.record()
+    return result
+
+def run_sweep(jobs, seed=None, n_workers=None, verbose=True, instrument=False):
+    """
+    Run all jobs on a process pool, longest first.
+
+    Parameters:
+        jobs: list of dicts from make_grid
+        seed: master seed, one child SeedSequence is spawned per job
+        n_workers: number of worker processes (default: number of cores);
+            with n_workers=1 the jobs run in this process
+        verbose: print one line per finished job
+        instrument: passed to run_job
+
+    Returns:
+        results: list of result dicts from run_job, in the order of jobs
+    """
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(jobs))
+    order = sorted(range(len(jobs)), key=lambda k: estimate_cost(jobs[k]), reverse=True)
+    results = [None] * len(jobs)
+
+    def report(result):
+        if verbose:
+            print(f"L={result['L']:<5} T={result['T']:<6.3f} <E>/N = {result['E_mean']:.6f} "
+                  f"± {result['E_error']:.2e}   <|M|>/N = {result['M_mean']:.6f} "
+                  f"± {result['M_error']:.2e}   tau_E = {result['tau_E']:.1f} MCS   "
+                  f"({result['elapsed']:.1f} s)")
+
+    if n_workers == 1:
+        for k in order:
+            results[k] = run_job(jobs[k], seed_sequences[k], instrument)
+            report(results[k])
+        return results
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        # The pool starts tasks in submission order, so this is longest-first
+        futures = {pool.submit(run_job, jobs[k], seed_sequences[k], instrument): k for k in order}
+        for future in as_completed(futures):
+            k = futures[future]
+            results[k] = future.result()
+            report(results[k])
+    return results
+
+# ==============================================================================
+# RESULTS TABLE
+# ==============================================================================
+
+TABLE_COLUMNS = ("L", "T", "n_MCS", "n_meas", "n_discard", "E_mean", "E_error",
+                 "M_mean", "M_error", "E_error_tau", "M_error_tau", "tau_E", "tau_M",
+                 "elapsed", "flip_rate")
+SERIES_COLUMNS = ("energies", "magnetizations", "bin_sizes", "E_bin_errors", "M_bin_errors",
+                  "moment_bins")
+
+def results_table(results):
+    """
+    Collect the scalar results in one table of columns.
+
+    Parameters:
+        results: list of result dicts from run_sweep
+
+    Returns:
+        table: dict of column name -> (n_jobs,) array
+    """
+    return {name: np.array([r[name] for r in results]) for name in TABLE_COLUMNS}
+
+def derived_table(results):
+    """
+    Jackknife estimates of e, m, C_v, χ and U_4 for every job.
+
+    The moment bins of all jobs of one lattice size are stacked and analysed
+    in one vectorized call; jobs with more bins than the others of their
+    size are truncated to the common number.
+
+    Parameters:
+        results: list of result dicts from run_sweep (or load_results)
+
+    Returns:
+        table: dict with columns L, T and, for every observable of
+            jackknife.derived_observables, "<name>" and "<name>_error"
+    """
+    n_jobs = len(results)
+    table = {"L": np.array([r["L"] for r in results]), "T": np.array([r["T"] for r in results])}
+    for L in np.unique(table["L"]):
+        members = np.flatnonzero(table["L"] == L)
+        n_bins = min(len(results[k]["moment_bins"]) for k in members)
+        bins = np.stack([results[k]["moment_bins"][:n_bins] for k in members])
+        for name, (value, error) in derived_observables(bins, table["T"][members], L**2).items():
+            table.setdefault(name, np.full(n_jobs, np.nan))[members] = value
+            table.setdefault(f"{name}_error", np.full(n_jobs, np.nan))[members] = error
+    return table
+
+def save_results(results, filename):
+    """
+    Save the results table and every time series in one .npz file.
+
+    The table columns are stored under their names; the series of job k
+    under "<column>_<k>", e.g. "energies_3".
+
+    Parameters:
+        results: list of result dicts from run_sweep
+        filename: output .npz file
+    """
+    arrays = results_table(results)
+    for k, result in enumerate(results):
+        for name in SERIES_COLUMNS:
+            arrays[f"{name}_{k}"] = result[name]
+    np.savez_compressed(filename, **arrays)
+
+def load_results(filename):
+    """
+    Load a file written by save_results back into a list of result dicts.
+
+    Parameters:
+        filename: .npz file from save_results
+
+    Returns:
+        results: list of result dicts
+    """
+    with np.load(filename) as data:
+        n_jobs = len(data["L"])
+        results = []
+        for k in range(n_jobs):
+            result = {name: data[name][k].item() for name in TABLE_COLUMNS}
+            result.update({name: data[f"{name}_{k}"] for name in SERIES_COLUMNS})
+            results.append(result)
+    return results
+
+# ==============================================================================
+# COMMAND LINE INTERFACE
+# ==============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run an Ising temperature / lattice-size sweep.")
+    parser.add_argument("--L", type=int, nargs="+", default=[100], help="lattice sizes")
+    parser.add_argument("--T", type=float, nargs="+", help="temperatures (overrides --T-min/--T-max/--dT)")
+    parser.add_argument("--T-min", type=float, default=2.0)
+    parser.add_argument("--T-max", type=float, default=3.0)
+    parser.add_argument("--dT", type=float, default=0.1)
+    parser.add_argument("--n-mcs", type=int, default=10**6, help="total number of MCS per run")
+    parser.add_argument("--n-meas", type=int, default=10, help="MCS between two measurements")
+    parser.add_argument("--n-discard", type=int, default=1000, help="MCS discarded for equilibration")
+    parser.add_argument("--engine", default="checkerboard", help="update engine")
+    parser.add_argument("--seed", type=int, default=None, help="master seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes")
+    parser.add_argument("--output", default="sweep_results.npz", help="output .npz file")
+    parser.add_argument("--instrument", default=None,
+                        help="JSON Lines file for the timers and acceptance counters of every job")
+    args = parser.parse_args(argv)
+
+    if args.T is not None:
+        T_values = args.T
+    else:
+        n_T = int(round((args.T_max - args.T_min) / args.dT)) + 1
+        T_values = np.round(args.T_min + args.dT * np.arange(n_T), 10)
+
+    jobs = make_grid(args.L, T_values, args.n_mcs, args.n_meas, args.n_discard, args.engine)
+    print(f"Running {len(jobs)} jobs on {args.workers} workers (master seed {args.seed})")
+    results = run_sweep(jobs, seed=args.seed, n_workers=args.workers,
+                        instrument=args.instrument is not None)
+    save_results(results, args.output)
+    print(f"Results saved as: {args.output}")
+    if args.instrument is not None:
+        for result in results:
+            write_record(args.instrument, result["instrumentation"])
+        print(f"Instrumentation records saved as: {args.instrument}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Parallel tempering (replica exchange) for the Ising model.
+
+K replicas are simulated at K temperatures at the same time with the
+nbr-based checkerboard update of ising.py. Every swap_interval MCS, replicas
+at neighboring temperatures T_k, T_k+1 try to exchange their temperatures,
+accepted with probability
+
+    min(1, exp((β_k - β_k+1) * (E_k - E_k+1)))
+
+which keeps every replica in equilibrium at its temperature. Configurations
+from high temperatures travel down to T_c, which strongly reduces the
+autocorrelation time there.
+
+Only temperatures are exchanged, not configurations: the spins stay in the
+worker process that owns the replica, and only energies are communicated.
+If a worker fails, run_tempering raises a RuntimeError with its traceback.
+"""
+
+import multiprocessing as mp
+import traceback
+
+import numpy as np
+
+from ising import (checkerboard_sublattices, create_nbr, measure_observables,
+                   precompute_acceptance, sweep_checkerboard)
+
+JOIN_TIMEOUT = 10.0   # seconds to wait for a worker to exit before terminating it
+
+# ==============================================================================
+# REPLICAS OF ONE WORKER
+# ==============================================================================
+
+class ReplicaGroup:
+    """
+    The replicas owned by one worker: spins, running E and M, and one
+    random number stream per replica.
+    """
+
+    def __init__(self, nbr, seed_sequences):
+        self.nbr = nbr
+        self.sublattices = checkerboard_sublattices(nbr)
+        self.rngs = [np.random.default_rng(s) for s in seed_sequences]
+        self.spins = [rng.choice(np.array([-1, 1], dtype=np.int8), size=nbr.shape[0])
+                      for rng in self.rngs]
+        observables = [measure_observables(s, nbr) for s in self.spins]
+        self.E = [E for E, _ in observables]
+        self.M = [M for _, M in observables]
+
+    def advance(self, betas, first_mcs, n_sweeps, n_meas):
+        """
+        Run n_sweeps MCS of every replica at its current inverse temperature.
+
+        Parameters:
+            betas: inverse temperature of each replica of the group
+            first_mcs: global MCS counter before this call
+            n_sweeps: number of MCS to run
+            n_meas: number of MCS between two measurements
+
+        Returns:
+            E: final energy of each replica
+            measurements: list of (measurement index, E array, M array)
+        """
+        z = self.nbr.shape[1]
+        tables = [precompute_acceptance(beta, z) for beta in betas]
+        measurements = []
+        for mcs_step in range(first_mcs, first_mcs + n_sweeps):
+            for r, rng in enumerate(self.rngs):
+                _, delta_E, delta_M = sweep_checkerboard(self.spins[r], self.nbr, tables[r],
+                                                         self.sublattices, rng)
+                self.E[r] += delta_E
+                self.M[r] += delta_M
+            if (mcs_step + 1) % n_meas == 0:
+                measurements.append(((mcs_step + 1) // n_meas - 1, list(self.E), list(self.M)))
+        return list(self.E), measurements
+
+def _worker(conn, nbr, seed_sequences):
+    """
+    Worker process: owns a ReplicaGroup and answers advance requests.
+
+    On any error (None, traceback) is sent instead of the reply.
+    """
+    try:
+        group = ReplicaGroup(nbr, seed_sequences)
+        conn.send(list(group.E))
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            conn.send(group.advance(*request))
+    except BaseException:
+        conn.send((None, traceback.format_exc()))
+    finally:
+        conn.close()
+
+def _receive(conn, index):
+    """Reply of worker index; raise with its traceback if it failed."""
+    try:
+        reply = conn.recv()
+    except EOFError:
+        raise RuntimeError(f"Worker {index} exited without a reply") from None
+    if isinstance(reply, tuple) and reply[0] is None:
+        raise RuntimeError(f"Worker {index} failed:\n{reply[1]}")
+    return reply
+
+# ==============================================================================
+# REPLICA EXCHANGE DRIVER
+# ==============================================================================
+
+def run_tempering(T_values, n_MCS, n_meas, L=None, nbr=None, swap_interval=10,
+                  seed=None, n_workers=1):
+    """
+    Run a parallel tempering simulation over a set of temperatures.
+
+    Parameters:
+        T_values: temperatures (strictly increasing), one replica per temperature
+        n_MCS: total number of Monte Carlo steps
+        n_meas: number of MCS between two measurements
+        L: linear size of the square lattice (ignored if nbr is given)
+        nbr: neighbor array
+        swap_interval: number of MCS between two rounds of swap attempts
+        seed: master seed; each replica and the swap moves get their own stream
+        n_workers: number of processes the replicas are distributed over
+            (1 = everything in this process)
+
+    Returns:
+        results: dict with
+            T: (K,) temperatures
+            energies: (K, n_MCS // n_meas) E time series of each temperature
+            magnetizations: (K, n_MCS // n_meas) M time series of each temperature
+            swap_acceptance: (K - 1,) acceptance rate of swaps between T_k and T_k+1
+            replica_temperature: (K,) temperature index of each replica at the end
+    """
+    T_values = np.asarray(T_values, dtype=np.float64)
+    if (T_values.ndim != 1 or T_values.size == 0 or T_values[0] <= 0
+            or np.any(np.diff(T_values) <= 0)):
+        # Swaps are only tried between neighboring indices
+        raise ValueError("T_values must be positive and strictly increasing")
+    betas = 1.0 / T_values
+    K = len(T_values)
+    if nbr is None:
+        nbr = create_nbr(L)
+
+    seed_sequences = np.random.SeedSequence(seed).spawn(K + 1)
+    swap_rng = np.random.default_rng(seed_sequences[K])
+
+    # Replica r lives in worker owner[r]; replica_temperature[r] = its T index
+    n_workers = max(1, min(n_workers, K))
+    owners = np.array_split(np.arange(K), n_workers)
+    replica_temperature = np.arange(K)
+    E = np.zeros(K, dtype=np.int64)
+
+    if n_workers == 1:
+        groups = [ReplicaGroup(nbr, seed_sequences[:K])]
+        E[:] = groups[0].E
+        connections = None
+    else:
+        connections, processes = [], []
+        for replicas in owners:
+            parent, child = mp.Pipe()
+            process = mp.Process(target=_worker,
+                                 args=(child, nbr, [seed_sequences[r] for r in replicas]),
+                                 daemon=True)
+            process.start()
+            child.close()       # so a dead worker gives EOFError instead of a hang
+            connections.append(parent)
+            processes.append(process)
+
+    n_measurements = n_MCS // n_meas
+    energies = np.zeros((K, n_measurements), dtype=np.int64)
+    magnetizations = np.zeros((K, n_measurements), dtype=np.int64)
+    swap_attempts = np.zeros(K - 1, dtype=np.int64)
+    swap_accepted = np.zeros(K - 1, dtype=np.int64)
+
+    try:
+        if connections is not None:
+            for index, (replicas, conn) in enumerate(zip(owners, connections)):
+                E[replicas] = _receive(conn, index)
+        mcs_done = 0
+        n_rounds = 0
+        while mcs_done < n_MCS:
+            n_sweeps = min(swap_interval, n_MCS - mcs_done)
+
+            # Advance all replicas (workers run concurrently)
+            requests = [(betas[replica_temperature[replicas]], mcs_done, n_sweeps, n_meas)
+                        for replicas in owners]
+            if connections is None:
+                replies = [groups[0].advance(*requests[0])]
+            else:
+                for conn, request in zip(connections, requests):
+                    conn.send(request)
+                replies = [_receive(conn, index) for index, conn in enumerate(connections)]
+
+            for replicas, (E_group, measurements) in zip(owners, replies):
+                E[replicas] = E_group
+                for idx, E_meas, M_meas in measurements:
+                    energies[replica_temperature[replicas], idx] = E_meas
+                    magnetizations[replica_temperature[replicas], idx] = M_meas
+            mcs_done += n_sweeps
+
+            # Swap attempts between neighboring temperatures, alternating
+            # between the pairs (0,1), (2,3), ... and (1,2), (3,4), ...
+            replica_at = np.argsort(replica_temperature)
+            for k in range(n_rounds % 2, K - 1, 2):
+                a, b = replica_at[k], replica_at[k + 1]
+                swap_attempts[k] += 1
+                log_p = (betas[k] - betas[k + 1]) * (E[a] - E[b])
+                if log_p >= 0 or swap_rng.random() < np.exp(log_p):
+                    replica_temperature[a], replica_temperature[b] = k + 1, k
+                    swap_accepted[k] += 1
+            n_rounds += 1
+    finally:
+        if connections is not None:
+            for conn in connections:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass        # the worker has already exited
+            for process in processes:
+                process.join(JOIN_TIMEOUT)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+    return dict(T=T_values, energies=energies, magnetizations=magnetizations,
+                swap_acceptance=swap_accepted / np.maximum(swap_attempts, 1),
+                replica_temperature=replica_temperature)
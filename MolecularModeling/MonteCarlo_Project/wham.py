@@ -0,0 +1,235 @@
+"""
+Multi-histogram reweighting (WHAM, Ferrenberg-Swendsen 1989) of a sweep.
+
+R runs at β_1 .. β_R with histograms H_r(E) of n_r samples each are combined
+into one estimate of the density of states Ω(E), which gives every
+observable at any temperature inside (and slightly around) the sweep:
+
+    Ω(E)  = Σ_r H_r(E) / Σ_r n_r exp(f_r - β_r E)
+    f_r   = -ln Σ_E Ω(E) exp(-β_r E)
+
+Iterating these two equations converges very slowly when neighboring
+histograms overlap little (~10⁴ iterations for an L = 100 sweep in steps of
+0.1). Instead the f_r are found as the minimum of the convex function
+
+    A(f) = Σ_E H(E) ln Σ_r n_r exp(f_r - β_r E) - Σ_r n_r f_r
+
+(H = Σ_r H_r), whose stationarity condition is exactly the pair above, with
+Newton's method: one R x R linear system per step and ~10 steps. All sums
+over E are log-sum-exp reductions over an (R, K) array (K energy levels),
+so nothing overflows even for L = 100, where β E reaches ~10⁴.
+
+Magnetization observables use the joint histograms H_r(E, M): the states
+are then the distinct (E, M) pairs and the denominator still only depends
+on E, so the same equations apply unchanged.
+
+Histograms of correlated samples can be given effective sample sizes with
+the statistical inefficiency g_r = 2 τ_int,r (see autocorr.py).
+"""
+
+import numpy as np
+
+# ==============================================================================
+# HISTOGRAMS
+# ==============================================================================
+
+def _logsumexp(a, axis):
+    """ln Σ exp(a) along axis, shifted by the maximum to avoid overflow."""
+    shift = np.max(a, axis=axis, keepdims=True)
+    shift[~np.isfinite(shift)] = 0.0
+    return np.squeeze(shift, axis=axis) + np.log(np.sum(np.exp(a - shift), axis=axis))
+
+def histograms_from_series(energies, magnetizations=None):
+    """
+    Histograms of several runs over their common states.
+
+    Parameters:
+        energies: list of R integer E series (arrays or memmaps)
+        magnetizations: optional list of R integer M series; the states are
+            then the distinct (E, M) pairs
+
+    Returns:
+        E: (K,) int64 energies of the K distinct states
+        M: (K,) int64 magnetizations (None without magnetizations)
+        H: (R, K) int64 array of counts
+    """
+    E_all = np.concatenate([np.asarray(e, dtype=np.int64) for e in energies])
+    run = np.repeat(np.arange(len(energies)), [len(e) for e in energies])
+    if magnetizations is None:
+        states, index = np.unique(E_all, return_inverse=True)
+        E, M = states, None
+    else:
+        M_all = np.concatenate([np.asarray(m, dtype=np.int64) for m in magnetizations])
+        M_min = M_all.min()
+        width = M_all.max() - M_min + 1
+        states, index = np.unique((E_all - E_all.min()) * width + (M_all - M_min),
+                                  return_inverse=True)
+        E, M = states // width + E_all.min(), states % width + M_min
+    H = np.zeros((len(energies), states.size), dtype=np.int64)
+    np.add.at(H, (run, index), 1)
+    return E, M, H
+
+def histograms_from_accumulators(accumulators):
+    """
+    Joint histograms of several runs from reweighting.HistogramAccumulator.
+
+    Parameters:
+        accumulators: list of R HistogramAccumulator (same lattice)
+
+    Returns:
+        E, M: (K,) int64 energies and magnetizations of the distinct states
+        H: (R, K) int64 array of counts (summed over the blocks of each run)
+    """
+    per_run = [accumulator.histogram() for accumulator in accumulators]
+    E_all = np.concatenate([E for E, _, _ in per_run])
+    M_all = np.concatenate([M for _, M, _ in per_run])
+    counts = np.concatenate([H.sum(axis=0) for _, _, H in per_run])
+    run = np.repeat(np.arange(len(per_run)), [len(E) for E, _, _ in per_run])
+
+    M_min = M_all.min()
+    width = M_all.max() - M_min + 1
+    states, index = np.unique((E_all - E_all.min()) * width + (M_all - M_min), return_inverse=True)
+    H = np.zeros((len(per_run), states.size), dtype=np.int64)
+    np.add.at(H, (run, index), counts)
+    return states // width + E_all.min(), states % width + M_min, H
+
+# ==============================================================================
+# SELF-CONSISTENT FREE ENERGIES
+# ==============================================================================
+
+def solve_free_energies(E, H, T_runs, g=None, tol=1e-10, max_iter=100):
+    """
+    Solve the WHAM equations for the free energies f_r of the runs.
+
+    Parameters:
+        E: (K,) energies of the states
+        H: (R, K) counts of every run in every state
+        T_runs: (R,) temperatures of the runs
+        g: optional (R,) statistical inefficiencies 2 τ_int (autocorr.py); counts
+            and sample sizes are divided by them
+        tol: stop when no f_r changes by more than tol
+        max_iter: maximum number of Newton steps
+
+    Returns:
+        f: (R,) free energies β_r F_r, with f[0] = 0
+        log_omega: (K,) ln Ω of every state (same normalization)
+        n_iter: number of Newton steps used
+    """
+    H = np.asarray(H, dtype=np.float64)
+    if g is not None:
+        H = H / np.asarray(g, dtype=np.float64)[:, None]
+    beta = 1.0 / np.asarray(T_runs, dtype=np.float64)
+    E = np.asarray(E, dtype=np.float64)
+    # Energies relative to their mean keep β E and the f_r small
+    beta_E = beta[:, None] * (E - E.mean())[None, :]        # (R, K)
+
+    counts = H.sum(axis=0)                                  # every state was visited
+    n = H.sum(axis=1)
+    log_n = np.log(n)
+
+    def objective(f):
+        log_denominator = _logsumexp(log_n[:, None] + f[:, None] - beta_E, axis=0)
+        return counts @ log_denominator - n @ f, log_denominator
+
+    # Start from thermodynamic integration, d f / d β = <E>, with the
+    # trapezoidal rule between the runs in order of β; fixed f_0 = 0
+    mean_E = (H @ (E - E.mean())) / n
+    order = np.argsort(beta)
+    f = np.zeros_like(beta)
+    f[order[1:]] = np.cumsum(np.diff(beta[order]) * (mean_E[order][1:] + mean_E[order][:-1]) / 2)
+    f -= f[0]
+    value, log_denominator = objective(f)
+    for n_iter in range(1, max_iter + 1):
+        # p[r, k]: share of run r in the denominator of state k
+        p = np.exp(log_n[:, None] + f[:, None] - beta_E - log_denominator[None, :])
+        gradient = p @ counts - n
+        hessian = np.diag(gradient + n) - (p * counts[None, :]) @ p.T
+        step = np.zeros_like(f)
+        step[1:] = -np.linalg.lstsq(hessian[1:, 1:], gradient[1:], rcond=None)[0]
+
+        # Backtracking keeps every step downhill far from the minimum
+        scale = 1.0
+        while True:
+            new_value, new_log_denominator = objective(f + scale * step)
+            if new_value <= value or scale < 1e-8:
+                break
+            scale /= 2.0
+        f = f + scale * step
+        value, log_denominator = new_value, new_log_denominator
+        if np.max(np.abs(scale * step)) < tol:
+            break
+    # Back to absolute energies: Z_r = exp(-β_r <E>) Z_r(relative)
+    f = f + beta * E.mean()
+    return f - f[0], np.log(counts) - log_denominator, n_iter
+
+# ==============================================================================
+# OBSERVABLES AT ANY TEMPERATURE
+# ==============================================================================
+
+def observables(E, log_omega, T_values, N, M=None, counts=None):
+    """
+    Canonical averages per site from the density of states.
+
+    Parameters:
+        E: (K,) energies of the states
+        log_omega: (K,) ln Ω from solve_free_energies
+        T_values: temperatures
+        N: number of sites
+        M: optional (K,) magnetizations of the states (joint histograms)
+        counts: optional (K,) total number of samples in every state
+
+    Returns:
+        results: dict of (n_T,) arrays: "T", "e", "C_v", with M also "m",
+            "chi", "U_4", and with counts "n_effective": the number of samples
+            that effectively contribute, (Σw)² / Σw² over the sample weights w.
+            Curves are trustworthy where n_effective is large.
+    """
+    T_values = np.asarray(T_values, dtype=np.float64)
+    beta = 1.0 / T_values
+    E = np.asarray(E, dtype=np.float64)
+    E_ref = E.mean()
+    dE = E - E_ref
+
+    log_weight = log_omega[None, :] - beta[:, None] * dE[None, :]
+    weights = np.exp(log_weight - log_weight.max(axis=1, keepdims=True))
+    weights /= weights.sum(axis=1, keepdims=True)            # (n_T, K), rows sum to 1
+
+    def average(values):
+        return weights @ values
+
+    mean_dE = average(dE)
+    results = dict(T=T_values, e=(mean_dE + E_ref) / N,
+                   C_v=beta**2 * (average(dE**2) - mean_dE**2) / N)
+    if M is not None:
+        absM = np.abs(np.asarray(M, dtype=np.float64))
+        mean_absM, mean_M2, mean_M4 = average(absM), average(absM**2), average(absM**4)
+        results.update(m=mean_absM / N, chi=beta * (mean_M2 - mean_absM**2) / N,
+                       U_4=1.0 - mean_M4 / (3.0 * mean_M2**2))
+    if counts is not None:
+        # A sample in state k has weight weights[k] / counts[k]
+        results["n_effective"] = 1.0 / np.sum(weights**2 / np.asarray(counts)[None, :], axis=1)
+    return results
+
+def wham(E, H, T_runs, T_values, N, M=None, g=None, tol=1e-10):
+    """
+    Combine the histograms of a sweep and evaluate observables on T_values.
+
+    Parameters:
+        E: (K,) energies of the states (from histograms_from_series or
+            histograms_from_accumulators)
+        H: (R, K) counts
+        T_runs: (R,) temperatures of the runs
+        T_values: temperatures of the output curves
+        N: number of sites
+        M: optional (K,) magnetizations of the states
+        g: optional (R,) statistical inefficiencies
+        tol: convergence tolerance of the free energies
+
+    Returns:
+        results: dict from observables, plus "f" (free energies of the runs)
+            and "n_iter"
+    """
+    f, log_omega, n_iter = solve_free_energies(E, H, T_runs, g, tol)
+    results = observables(E, log_omega, T_values, N, M, counts=np.sum(H, axis=0))
+    results.update(f=f, n_iter=n_iter)
+    return results